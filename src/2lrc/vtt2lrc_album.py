@@ -0,0 +1,172 @@
+import sys
+import os
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2txt"))
+from vl2txt_mergeOutput import extract_number_from_filename
+from vtt2lrc_terminal1 import parse_time, DEFAULT_THRESHOLD_MICRO
+from vtt2lrc_stream import iter_file_text, read_file_text, iter_lines, cue_pipeline, write_cues, make_cleaner
+from vtt2lrc_retime import make_retimer
+from vtt2lrc_batch import is_vtt_file
+from vtt2lrc_catalog import track_info
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+from vtt2lrc_compress import split_compression
+from vtt2lrc_formats import MEDIA_EXTENSIONS
+
+
+# -*- coding: utf-8 -*-
+
+# 作品文件夹中的音轨时长清单文件名
+DURATIONS_FILE = "durations.json"
+
+
+def format_album_time(time_micro):
+    """与 format_time 相同，但分钟数不按小时取模，超过一小时的合并 LRC 也能正确定位"""
+    total_seconds = time_micro // 1000000
+    minutes, seconds = divmod(total_seconds, 60)
+    return f"{minutes:02d}:{seconds:02d}.{time_micro % 1000000:06d}"[:-4]
+
+
+def find_tracks(folder_path):
+    """作品文件夹（不含子文件夹）中的 VTT 文件，按 extract_number_from_filename 排序"""
+    tracks = [os.path.join(folder_path, name) for name in os.listdir(folder_path)
+              if is_vtt_file(name) and os.path.isfile(os.path.join(folder_path, name))]
+    return sorted(tracks, key=lambda f: extract_number_from_filename(os.path.basename(split_compression(f)[0])))
+
+
+def parse_duration(value):
+    """时长可以是秒数，也可以是 "MM:SS.mmm"、"HH:MM:SS.mmm"，返回微秒"""
+    if isinstance(value, (int, float)):
+        return round(value * 1000000)
+    return parse_time(value)
+
+
+def load_durations(path):
+    """读取音轨时长清单，格式为 {"01.mp3": 1234.5, "02": "20:31.250", ...}
+
+    键可以带或不带 .mp3、.wav 扩展名，返回 {音轨名: 微秒}。
+    """
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    durations = {}
+    for name, value in manifest.items():
+        base, ext = os.path.splitext(name)
+        if ext.lower() in MEDIA_EXTENSIONS:
+            name = base
+        durations[name] = parse_duration(value)
+    return durations
+
+
+def write_track(input_file, out, offset_micro, last_end_micro, clean=None, cache_path=None,
+                threshold_micro=DEFAULT_THRESHOLD_MICRO, dedup=False):
+    """把一个音轨的字幕平移 offset_micro 后写出，返回 (最后一条字幕的结束时间, 是否有字幕)
+
+    音轨逐块读取、逐条写出，不会把整个音轨读入内存。
+    """
+    retimer = make_retimer(offset=offset_micro)
+    start = out.tell()
+    try:
+        cues = cue_pipeline(iter_lines(iter_file_text(input_file, cache_path)), clean, retimer, dedup=dedup)
+        end_micro = write_cues(cues, out, last_end_micro, threshold_micro, format_album_time)
+    except UnicodeDecodeError:
+        # 开头猜测的编码不适用于整个文件，丢弃已写出的部分，整个文件重新读取
+        out.seek(start)
+        out.truncate()
+        cues = cue_pipeline(iter_lines(read_file_text(input_file, cache_path)), clean, retimer, dedup=dedup)
+        end_micro = write_cues(cues, out, last_end_micro, threshold_micro, format_album_time)
+    return end_micro, out.tell() != start or end_micro != last_end_micro
+
+
+def build_album(folder_path, output_file, durations=None, clean=None, cache_path=None, dedup=False):
+    """把作品文件夹中的所有音轨按顺序合并为一个 LRC，每个音轨的时间加上之前所有音轨的总时长
+
+    音轨时长取自 durations（{音轨名: 微秒}），没有时取该音轨最后一条字幕的结束时间。
+    返回合并的音轨数。
+    """
+    tracks = find_tracks(folder_path)
+    if not tracks:
+        return 0
+
+    durations = durations or {}
+    offset_micro = 0
+    # 与 write_lrc 相同，第一条字幕前不写间隔行
+    last_end_micro = parse_time("23:59:59.999")
+    has_any = False
+
+    # 写出的内容需要在编码检测失败时回退，所以先写普通文件
+    with open(output_file, 'w', encoding='utf-8') as out:
+        out.write("[re:vtt2lrc]\n")
+        for track in tracks:
+            track_end, has_cues = write_track(track, out, offset_micro, last_end_micro, clean, cache_path,
+                                              dedup=dedup)
+            if has_cues:
+                last_end_micro = track_end
+                has_any = True
+
+            duration = durations.get(track_info(track)[1])
+            if duration is not None:
+                offset_micro += duration
+            elif has_cues:
+                offset_micro = max(offset_micro, track_end)
+
+        # 写入最后的时间
+        out.write(f"[{format_album_time(last_end_micro if has_any else 0)}]\n")
+
+    return len(tracks)
+
+
+def album_output_path(folder_path):
+    """默认输出到作品文件夹旁边：<上级文件夹>/<作品文件夹名>.lrc，避免被当作音轨再次合并"""
+    folder_path = os.path.abspath(folder_path)
+    return os.path.join(os.path.dirname(folder_path), os.path.basename(folder_path) + ".lrc")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把作品文件夹中的所有 vtt 合并为一个连续播放用的 lrc")
+    parser.add_argument("folders", nargs="+", help="作品文件夹，可以有多个")
+    parser.add_argument("-o", "--output", help="输出文件，只有一个作品文件夹时可用；默认 <上级文件夹>/<作品名>.lrc")
+    parser.add_argument("--durations",
+                        help=f"音轨时长清单（JSON），默认使用作品文件夹中的 {DURATIONS_FILE}（如果存在）")
+    parser.add_argument("--clean", action="store_true",
+                        help="去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体，合并空白")
+    parser.add_argument("--fold-width", action="store_true", help="全角英数字和符号转为半角")
+    parser.add_argument("--dedup", action="store_true",
+                        help="合并自动生成字幕（滚动字幕）中重复的字幕，保留最早的开始时间")
+    parser.add_argument("--encoding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"编码检测缓存（SQLite）的路径，默认 {DEFAULT_CACHE_PATH}")
+    args = parser.parse_args(argv)
+    if args.output and len(args.folders) > 1:
+        parser.error("指定 -o 时只能有一个作品文件夹")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    clean = make_cleaner(args.clean, args.fold_width)
+    failed = 0
+
+    for folder_path in args.folders:
+        if not os.path.isdir(folder_path):
+            print(f"路径 '{folder_path}' 无效或不是文件夹。")
+            failed += 1
+            continue
+
+        output_file = args.output or album_output_path(folder_path)
+        durations_file = args.durations or os.path.join(folder_path, DURATIONS_FILE)
+        try:
+            durations = load_durations(durations_file) if os.path.isfile(durations_file) else None
+            count = build_album(folder_path, output_file, durations, clean, args.encoding_cache, args.dedup)
+        except Exception as e:
+            print(f"合并失败: {folder_path}: {e}")
+            failed += 1
+            continue
+
+        if count:
+            print(f"成功合并 {count} 个音轨到: {output_file}")
+        else:
+            print(f"文件夹 '{folder_path}' 中没有找到 .vtt 文件。")
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,355 @@
+import os
+import re
+import time
+import codecs
+import bisect
+import queue
+import itertools
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from vtt2lrc_stream import convert_vtt_to_lrc, PREFIX_SIZE
+from vtt2lrc_compress import split_compression, open_input, compression_suffix
+from vtt2lrc_metrics import BatchReporter
+from vtt2lrc_retime import folder_retimer
+from vtt2lrc_walk import walk_files, iter_files, DEFAULT_WALK_THREADS
+from vtt2lrc_formats import supports, output_path, format_extension, extensions
+from vtt2lrc_profile import profile_call
+
+
+# -*- coding: utf-8 -*-
+
+# 一个转换任务。detect 为是否需要 chardet 检测编码，在列目录的线程中读取文件开头得到，
+# 调度时不再读文件；None 表示未知，按需要检测处理
+Job = namedtuple("Job", ["input_file", "output_file", "size", "detect"], defaults=(None,))
+
+# 判断是否需要 chardet 时读取的文件开头字节数
+PROBE_SIZE = 64 * 1024
+
+# 转换和建立全文索引都是流式的，内存与文件大小基本无关；
+# chardet 只检测文件开头，约为检测字节数的 48 倍
+DETECT_MEMORY_FACTOR = 48
+# 需要检测编码的文件，开头猜测的编码中途解码失败时整个文件读入后重新检测（read_file_text），
+# 峰值内存与文件大小成正比：GBK 输入在 256K 到 8M 上实测为文件大小的 6.0 到 6.9 倍（越小越大），
+# 按实测最大值留出约 15% 余量
+FALLBACK_MEMORY_FACTOR = 8
+# 每个任务的固定内存开销
+MEMORY_BASE = 1024 * 1024
+
+# 小于该大小、且是 UTF-8 的文件交给线程池转换
+THREAD_MAX_SIZE = 256 * 1024
+# 线程池的线程数为进程数的倍数，小文件的转换大部分时间在等待读写
+THREADS_PER_WORKER = 4
+
+# 边查找边转换时，等待转换结果的同时每隔多少秒取一次新发现的文件
+DISCOVERY_POLL = 0.1
+
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def is_vtt_file(name):
+    return split_compression(name)[0].lower().endswith(".vtt")
+
+
+def is_input_file(name):
+    """是否为可以转换的字幕文件：.vtt，以及 vtt2lrc_formats 中注册了解析函数的格式（如 .srt）"""
+    return supports("cues", name)
+
+
+def find_vtt_files(folder_path, threads=DEFAULT_WALK_THREADS):
+    """递归查找所有可以转换的字幕文件（包括 .vtt.gz 等压缩文件），多线程并行列目录"""
+    return walk_files(folder_path, is_input_file, threads)
+
+
+def lrc_output_path(vtt_file, extension=".lrc"):
+    """生成输出文件名：如果文件名形如 "xxx.mp3.vtt" 或 "xxx.wav.vtt" 则输出 "xxx.lrc" """
+    return output_path(vtt_file, extension)
+
+
+def job_rank(job):
+    """多个输入文件输出到同一个文件时的优先顺序：
+
+    按 vtt2lrc_formats 中的格式顺序（.vtt 先于 .srt），同一格式未压缩的优先，最后按文件名
+    """
+    order = extensions("cues")
+    ext = format_extension(job.input_file)
+    rank = order.index(ext) if ext in order else len(order)
+    return rank, bool(split_compression(job.input_file)[1]), job.input_file
+
+
+def unique_outputs(jobs):
+    """多个输入文件输出到同一个文件时（如 a.vtt 和 a.srt 都输出 a.lrc），只保留优先的一个，顺序不变"""
+    chosen = {}
+    for job in jobs:
+        key = os.path.normcase(job.output_file)
+        if key not in chosen or job_rank(job) < job_rank(chosen[key]):
+            chosen[key] = job
+
+    kept = []
+    for job in jobs:
+        winner = chosen[os.path.normcase(job.output_file)]
+        if job is winner:
+            kept.append(job)
+        else:
+            print(f"跳过: {job.input_file}（与 {winner.input_file} 输出到同一个文件 {job.output_file}）")
+    return kept
+
+
+def make_jobs(vtt_files, extension=".lrc"):
+    """为每个文件生成转换任务，extension 为输出格式的扩展名"""
+    jobs = []
+    for vtt_file in vtt_files:
+        try:
+            size = os.path.getsize(vtt_file)
+        except OSError:
+            size = 0
+        jobs.append(Job(vtt_file, lrc_output_path(vtt_file, extension), size))
+    return unique_outputs(jobs)
+
+
+def iter_jobs(folder_path, threads=DEFAULT_WALK_THREADS, extension=".lrc"):
+    """边查找边生成转换任务，文件大小和是否需要检测编码都在列目录的线程中读取
+
+    输出文件与输入文件在同一个文件夹中，而一个文件夹的文件是一起列出的，
+    所以按文件夹分组去掉输出到同一个文件的输入，不必等整个目录树遍历结束。
+    """
+    found = iter_files(folder_path, is_input_file, threads, with_size=True, probe=probe_detection)
+    for _, group in itertools.groupby(found, key=lambda item: os.path.dirname(item[0])):
+        jobs = [Job(vtt_file, lrc_output_path(vtt_file, extension), size, detect)
+                for vtt_file, size, detect in group]
+        yield from unique_outputs(jobs)
+
+
+def largest_first(jobs):
+    """按文件大小从大到小排序（LPT），避免最后剩下一个大文件拖慢整批"""
+    return sorted(jobs, key=lambda job: job.size, reverse=True)
+
+
+def needs_detection(input_file):
+    """读取文件开头判断是否为 UTF-8，不是的话转换时会退回 chardet 检测编码"""
+    with open_input(input_file) as f:
+        data = f.read(PROBE_SIZE)
+    try:
+        # 开头可能在多字节字符中间截断，所以不是 final
+        codecs.getincrementaldecoder('utf-8')().decode(data)
+        return False
+    except UnicodeDecodeError:
+        return True
+
+
+def probe_detection(input_file):
+    """needs_detection，无法读取时返回 None（转换时会报告错误）"""
+    try:
+        return needs_detection(input_file)
+    except OSError:
+        return None
+
+
+def parse_size(text):
+    """把 "512M"、"2G"、"1.5GB" 这样的大小转换为字节数"""
+    match = SIZE_RE.match(text)
+    if not match:
+        raise ValueError(f"无法解析大小: '{text}'")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+def estimate_memory(job):
+    """估算转换一个文件的峰值内存
+
+    需要检测编码的文件按最坏情况估算：开头猜测的编码中途解码失败时，整个文件重新读入、检测，
+    内存按文件大小计算。不知道是否需要检测编码（job.detect 为 None）时按需要检测估算。
+    """
+    need = MEMORY_BASE
+    if job.detect is not False:
+        need += max(min(job.size, PREFIX_SIZE) * DETECT_MEMORY_FACTOR, job.size * FALLBACK_MEMORY_FACTOR)
+    return need
+
+
+def run_job(job, options, stats):
+    try:
+        # 作品文件夹中的 retime.json 优先于命令行的时间调整选项
+        retimer = folder_retimer(os.path.dirname(os.path.abspath(job.input_file)))
+    except Exception as e:
+        # 与转换失败一样由主进程的 reporter 记录
+        stats["error"] = type(e).__name__
+        stats["message"] = f"时间调整配置无效: {e}"
+        return False
+    if retimer is not None:
+        options = dict(options, retimer=retimer)
+    return convert_vtt_to_lrc(job.input_file, job.output_file, stats=stats, **options)
+
+
+def convert_job(job, options, profile=False):
+    """在线程或进程中转换一个任务，返回 (任务, 是否成功, 统计)
+
+    统计中除各阶段耗时外，还记录所在的进程、线程和起止时间（time.time()），
+    失败时 error、message 为异常类型和信息（不在线程、进程中打印），
+    profile 为 True 时还有该文件的 cProfile 结果。
+    """
+    stats = {"pid": os.getpid(), "tid": threading.get_ident(), "start": time.time()}
+    try:
+        if profile:
+            ok = profile_call(stats, run_job, job, options, stats)
+        else:
+            ok = run_job(job, options, stats)
+    finally:
+        stats["end"] = time.time()
+    return job, ok, stats
+
+
+def feed_jobs(jobs, incoming):
+    """在后台线程中逐个取出任务放入队列，结束时放入 None"""
+    try:
+        for job in jobs:
+            incoming.put(job)
+    except Exception as e:
+        print(f"查找文件失败: {e}")
+    finally:
+        incoming.put(None)
+
+
+def job_kind(job, executor="auto"):
+    """决定任务交给线程池还是进程池
+
+    小的 UTF-8 文件转换很快，主要时间花在读写文件上，用线程可以省去进程间传递任务和结果的开销；
+    大文件和需要 chardet 检测编码的文件主要消耗 CPU，用进程才能真正并行。
+    不知道是否需要检测编码的文件交给进程池。
+    """
+    if executor != "auto":
+        return executor
+    if job.size >= THREAD_MAX_SIZE:
+        return "process"
+    return "thread" if job.detect is False else "process"
+
+
+def run_batch(jobs, workers=None, max_memory=None, reporter=None, claims=None, executor="auto",
+              thread_workers=None, profiler=None, **options):
+    """并行转换所有任务，返回 (成功数, 失败数)
+
+    任务按文件大小从大到小（LPT）提交；指定 max_memory 时，只有正在转换的任务
+    估算内存总和不超过该值时才提交新任务。放不下的大文件等内存空出来再转换，
+    期间较小的文件继续提交；单个超过上限的文件只会在没有其他任务时独自转换。
+    jobs 不是列表而是迭代器（如 iter_jobs 的返回值）时，边查找边转换，
+    新发现的任务按大小插入待转换队列。
+    executor 为 "auto" 时按 job_kind 把小的 UTF-8 文件交给线程池（thread_workers 个线程），
+    其余交给进程池（workers 个进程）；"thread"、"process" 表示全部使用一种。
+    结果都在线程、进程中直接写入文件，不会把转换结果传回主进程。
+    options 原样传给 vtt2lrc_stream.convert_vtt_to_lrc（clean、cache_path、catalog_path 等）。
+    reporter 为 vtt2lrc_metrics.BatchReporter，负责逐文件日志、进度和指标，
+    不指定时逐文件打印结果。
+    claims 为 vtt2lrc_shard.LeaseClaims 时，每个任务提交前先认领，
+    已完成或被其他节点认领的任务跳过，多个节点可以同时处理同一个文件夹。
+    profiler 为 vtt2lrc_profile.BatchProfiler 时，收集每个文件的时间线和 cProfile 结果；
+    收集 cProfile 时全部使用进程池，同一进程中的多个线程不能同时分别做 profile。
+    """
+    workers = workers or os.cpu_count() or 1
+    profile = profiler is not None and profiler.profiling
+    if profile:
+        executor = "process"
+    thread_workers = thread_workers or workers * THREADS_PER_WORKER
+    streaming = not isinstance(jobs, list)
+    if reporter is None:
+        reporter = BatchReporter([] if streaming else jobs, suffix=compression_suffix(options.get("compression")))
+
+    limits = {"process": workers, "thread": thread_workers}
+    # 每种执行方式各有一个队列，按大小从大到小排列；
+    # 取负数后升序，用二分查找插入位置
+    queues = {kind: ([], [], []) for kind in limits}
+
+    def add_job(job):
+        pending, needs, neg_sizes = queues[job_kind(job, executor)]
+        index = bisect.bisect_right(neg_sizes, -job.size)
+        pending.insert(index, job)
+        needs.insert(index, 0 if max_memory is None else estimate_memory(job))
+        neg_sizes.insert(index, -job.size)
+
+    incoming = None
+    if streaming:
+        incoming = queue.Queue()
+        threading.Thread(target=feed_jobs, args=(jobs, incoming), daemon=True).start()
+    else:
+        for job in largest_first(jobs):
+            add_job(job)
+
+    in_flight = {}
+    running = dict.fromkeys(limits, 0)
+    used = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as processes, \
+                ThreadPoolExecutor(max_workers=thread_workers) as threads:
+            executors = {"process": processes, "thread": threads}
+            while any(q[0] for q in queues.values()) or in_flight or incoming is not None:
+                # 单个文件转换很久、查找很慢时，指标文件也按时更新
+                reporter.tick()
+                if incoming is not None:
+                    # 取出已发现的任务；没有任何任务可做时等待查找线程（最长等到下一次写入指标）
+                    idle = not in_flight and not any(q[0] for q in queues.values())
+                    try:
+                        job = incoming.get(block=idle, timeout=reporter.next_tick() if idle else None)
+                        while job is not None:
+                            add_job(job)
+                            reporter.add_job(job)
+                            job = incoming.get_nowait()
+                        incoming = None
+                    except queue.Empty:
+                        pass
+
+                # 在空闲进程、线程数和内存预算允许的范围内提交任务
+                for kind, (pending, needs, neg_sizes) in queues.items():
+                    index = 0
+                    while index < len(pending) and running[kind] < limits[kind]:
+                        if max_memory is not None and in_flight and used + needs[index] > max_memory:
+                            # 当前任务（需要检测编码）放不下，跳到下一个
+                            index += 1
+                            continue
+                        job = pending.pop(index)
+                        need = needs.pop(index)
+                        neg_sizes.pop(index)
+                        if claims is not None:
+                            try:
+                                claimed = claims.claim(job)
+                            except OSError as e:
+                                # 共享文件系统暂时不可用等，跳过该文件，留给之后的运行
+                                print(f"认领失败: {job.input_file}: {e}")
+                                claimed = False
+                            if not claimed:
+                                # 已经完成，或者其他节点正在转换
+                                reporter.skip_job(job)
+                                continue
+                        future = executors[kind].submit(convert_job, job, options, profile)
+                        in_flight[future] = (kind, need)
+                        running[kind] += 1
+                        used += need
+
+                if not in_flight:
+                    continue
+                # 查找还没结束时定期回来取新任务；到了写入指标的时间也回来
+                timeout = None if incoming is None else DISCOVERY_POLL
+                due = reporter.next_tick()
+                if due is not None:
+                    timeout = due if timeout is None else min(timeout, due)
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, need = in_flight.pop(future)
+                    running[kind] -= 1
+                    used -= need
+                    job, ok, stats = future.result()
+                    if claims is not None:
+                        try:
+                            claims.finish(job, ok)
+                        except OSError as e:
+                            # 没有记录完成，锁过期后其他节点会重新转换
+                            print(f"记录认领结果失败: {job.input_file}: {e}")
+                    reporter.job_done(job, ok, stats)
+                    if profiler is not None:
+                        profiler.job_done(job, ok, stats)
+    finally:
+        if claims is not None:
+            claims.close()
+
+    reporter.close()
+    return reporter.succeeded, reporter.failed
@@ -0,0 +1,183 @@
+import sys
+import os
+import heapq
+import argparse
+
+from vtt2lrc_terminal1 import parse_time, format_time, DEFAULT_THRESHOLD_MICRO
+from vtt2lrc_stream import iter_file_text, read_file_text, iter_lines, cue_pipeline, vtt_cues, make_cleaner
+from vtt2lrc_formats import find_handler, format_extension, output_path
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+
+
+# -*- coding: utf-8 -*-
+
+# 其他轨的字幕开始时间与主轨相差不超过该值（秒）时视为同一句
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_TOLERANCE_MICRO = round(DEFAULT_TOLERANCE * 1000000)
+
+
+def track_cues(input_file, reader, clean=None, cache_path=None, dedup=False):
+    """一个字幕文件的字幕流，格式按扩展名在 vtt2lrc_formats 中查找"""
+    parse = find_handler("cues", input_file, vtt_cues)
+    return cue_pipeline(iter_lines(reader(input_file, cache_path)), clean, parse=parse, dedup=dedup)
+
+
+def tag_track(cues, track):
+    """(开始, 结束, 文本) -> (开始, 轨道序号, 结束, 文本)，按开始时间、轨道序号排序"""
+    for begin_micro, end_micro, text in cues:
+        yield begin_micro, track, end_micro, text
+
+
+def align_cues(tracks, tolerance_micro=DEFAULT_TOLERANCE_MICRO, keep_unmatched=True):
+    """按时间对齐多个字幕流，产出 (开始微秒, 结束微秒, [各轨文本])
+
+    第一个字幕流为主轨，决定时间轴；其他轨的字幕开始时间与某条主轨字幕相差不超过
+    tolerance_micro 时并入该条（离下一条主轨字幕更近的留给下一条），同一轨并入多条时
+    文本用空格连接。没有对应主轨字幕的，keep_unmatched 为 True 时单独成一条。
+    各字幕流都按开始时间排列，只向前读取，时间为 O(n + m)，内存与字幕数无关。
+    """
+    primary = iter(tracks[0])
+    # 其他轨合并为一个按开始时间排列的流
+    others = heapq.merge(*(tag_track(cues, track) for track, cues in enumerate(tracks[1:], 1)))
+    count = len(tracks)
+
+    def single(other):
+        begin_micro, track, end_micro, text = other
+        texts = [""] * count
+        texts[track] = text
+        return begin_micro, end_micro, texts
+
+    cue = next(primary, None)
+    other = next(others, None)
+    while cue is not None:
+        following = next(primary, None)
+        begin_micro, end_micro, text = cue
+
+        # 早于当前主轨字幕、没有对应的其他轨字幕
+        while other is not None and other[0] < begin_micro - tolerance_micro:
+            if keep_unmatched:
+                yield single(other)
+            other = next(others, None)
+
+        parts = [[text]] + [[] for _ in range(count - 1)]
+        while other is not None and other[0] <= begin_micro + tolerance_micro:
+            if following is not None and other[0] - begin_micro > following[0] - other[0]:
+                break
+            parts[other[1]].append(other[3])
+            end_micro = max(end_micro, other[2])
+            other = next(others, None)
+
+        yield begin_micro, end_micro, [' '.join(part for part in track if part) for track in parts]
+        cue = following
+
+    while other is not None:
+        if keep_unmatched:
+            yield single(other)
+        other = next(others, None)
+
+
+def group_lines(texts, separator=None):
+    """一组中有文本的各轨，指定 separator 时合为一行"""
+    texts = [text for text in texts if text]
+    if separator is not None and texts:
+        return [separator.join(texts)]
+    return texts
+
+
+def write_bilingual_lrc(groups, out, separator=None, threshold_micro=DEFAULT_THRESHOLD_MICRO):
+    """与 write_lrc 相同，但每组的各轨文本写成时间相同的多行（或用 separator 合为一行）"""
+    out.write("[re:vtt2lrc]\n")
+    last_end_micro = parse_time("23:59:59.999")
+    for begin_micro, end_micro, texts in groups:
+        # 检查阈值
+        if begin_micro - last_end_micro > threshold_micro:
+            out.write(f"[{format_time(last_end_micro)}]\n")
+
+        for text in group_lines(texts, separator):
+            out.write(f"[{format_time(begin_micro)}] {text}\n")
+
+        last_end_micro = end_micro
+
+    # 写入最后的时间
+    out.write(f"[{format_time(last_end_micro)}]\n")
+
+
+def write_bilingual_txt(groups, out, separator=None):
+    """每组的各轨文本依次各占一行（或用 separator 合为一行）"""
+    for _, _, texts in groups:
+        for text in group_lines(texts, separator):
+            out.write(text + "\n")
+
+
+# 输出文件的扩展名 -> 写出函数
+BILINGUAL_WRITERS = {
+    ".lrc": write_bilingual_lrc,
+    ".txt": write_bilingual_txt,
+}
+
+
+def merge_tracks(input_files, output_file, tolerance_micro=DEFAULT_TOLERANCE_MICRO, separator=None,
+                 keep_unmatched=True, clean=None, cache_path=None, dedup=False):
+    """把同一音轨的多个字幕文件（第一个为主轨）按时间对齐后写成一个 LRC 或 TXT
+
+    所有文件同时逐块读取、边对齐边写出，不会把任何一个文件整个读入内存。
+    dedup 为 True 时各轨先分别合并滚动字幕中重复的字幕，再对齐。
+    """
+    writer = BILINGUAL_WRITERS.get(format_extension(output_file))
+    if writer is None:
+        raise ValueError(f"不支持的输出格式: {output_file}")
+
+    def write(reader):
+        tracks = [track_cues(input_file, reader, clean, cache_path, dedup) for input_file in input_files]
+        writer(align_cues(tracks, tolerance_micro, keep_unmatched), out, separator)
+
+    with open(output_file, 'w', encoding='utf-8') as out:
+        try:
+            write(iter_file_text)
+        except UnicodeDecodeError:
+            # 某个文件开头猜测的编码不适用于整个文件，丢弃已写出的部分，所有文件整个读取后重新对齐
+            out.seek(0)
+            out.truncate()
+            write(read_file_text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把同一音轨的原文和译文字幕按时间对齐，合并为双语 lrc 或 txt")
+    parser.add_argument("inputs", nargs="+", help="字幕文件，第一个为主轨（决定时间轴），至少两个")
+    parser.add_argument("-o", "--output", help="输出文件，扩展名为 .lrc 或 .txt；默认为主轨同名的 .lrc")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"开始时间相差不超过该值（秒）的字幕视为同一句，默认 {DEFAULT_TOLERANCE:g}")
+    parser.add_argument("--join", dest="separator",
+                        help="同一句的各轨文本用该分隔符合为一行，如 \" / \"；默认各占一行")
+    parser.add_argument("--drop-unmatched", action="store_true", help="丢弃没有对应主轨字幕的其他轨字幕")
+    parser.add_argument("--clean", action="store_true",
+                        help="去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体，合并空白")
+    parser.add_argument("--fold-width", action="store_true", help="全角英数字和符号转为半角")
+    parser.add_argument("--dedup", action="store_true",
+                        help="合并自动生成字幕（滚动字幕）中重复的字幕，保留最早的开始时间")
+    parser.add_argument("--encoding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"编码检测缓存（SQLite）的路径，默认 {DEFAULT_CACHE_PATH}")
+    args = parser.parse_args(argv)
+    if len(args.inputs) < 2:
+        parser.error("至少需要两个字幕文件")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_file = args.output or output_path(args.inputs[0], ".lrc")
+
+    for input_file in args.inputs:
+        if not os.path.isfile(input_file):
+            print(f"文件 '{input_file}' 不存在。")
+            sys.exit(1)
+
+    try:
+        merge_tracks(args.inputs, output_file, round(args.tolerance * 1000000), args.separator,
+                     not args.drop_unmatched, make_cleaner(args.clean, args.fold_width), args.encoding_cache,
+                     args.dedup)
+    except Exception as e:
+        print(f"合并失败: {e}")
+        sys.exit(1)
+
+    print(f"成功合并: {' + '.join(args.inputs)} -> {output_file}")
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+
+# -*- coding: utf-8 -*-
+
+# 编码检测缓存的默认位置
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".vtt2lrc_encoding.sqlite")
+
+# 每个进程对每个缓存文件只打开一次连接，多线程（转换服务）共用时加锁
+_connections = {}
+_lock = threading.Lock()
+
+
+def content_hash(raw_data):
+    """文件内容的哈希，作为缓存的键"""
+    return hashlib.blake2b(raw_data, digest_size=16).hexdigest()
+
+
+def open_cache(cache_path=DEFAULT_CACHE_PATH):
+    """打开（必要时创建）缓存数据库，同一进程内复用连接"""
+    conn = _connections.get(cache_path)
+    if conn is None:
+        # 多个进程同时写入时等待而不是报错
+        conn = sqlite3.connect(cache_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS encodings ("
+            " hash TEXT PRIMARY KEY,"
+            " encoding TEXT NOT NULL,"
+            " confidence REAL)"
+        )
+        _connections[cache_path] = conn
+    return conn
+
+
+def lookup_encoding(cache_path, digest):
+    """返回 (encoding, confidence)，没有记录时返回 None
+
+    缓存文件无法打开、损坏或被锁住时也返回 None，调用方照常检测编码。
+    """
+    try:
+        with _lock:
+            return open_cache(cache_path).execute(
+                "SELECT encoding, confidence FROM encodings WHERE hash = ?", (digest,)
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def store_encoding(cache_path, digest, encoding, confidence):
+    """保存检测结果；缓存不可写（只读、磁盘已满、损坏）时放弃保存，不影响转换"""
+    try:
+        with _lock:
+            open_cache(cache_path).execute(
+                "INSERT OR REPLACE INTO encodings (hash, encoding, confidence) VALUES (?, ?, ?)",
+                (digest, encoding, confidence),
+            )
+    except (sqlite3.Error, OSError):
+        pass
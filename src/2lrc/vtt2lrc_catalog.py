@@ -0,0 +1,234 @@
+import sys
+import os
+import time
+import sqlite3
+import threading
+import itertools
+import argparse
+
+from vtt2lrc_formats import track_name
+
+
+# -*- coding: utf-8 -*-
+
+# 默认的字幕全文索引位置
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".vtt2lrc_catalog.sqlite")
+
+# trigram 分词可以直接按子串检索中文、日文；旧版 SQLite 不支持时退回 unicode61
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    work TEXT NOT NULL,
+    track TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS cue_rows (
+    id INTEGER PRIMARY KEY,
+    track_id INTEGER NOT NULL,
+    begin_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cue_rows_track ON cue_rows (track_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS cue_fts USING fts5(
+    text, content='cue_rows', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS cue_rows_ai AFTER INSERT ON cue_rows BEGIN
+    INSERT INTO cue_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS cue_rows_ad AFTER DELETE ON cue_rows BEGIN
+    INSERT INTO cue_fts (cue_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# trigram 分词要求检索词至少 3 个字符，更短的检索词逐行匹配
+TRIGRAM_MIN_LENGTH = 3
+
+# 建立索引时每批插入的字幕数，字幕边转换边写入，不在内存中保留整个文件的字幕
+INDEX_BATCH = 1000
+
+# 每个线程各用自己的连接：批量转换时小文件在线程池中转换，各自提交事务
+_local = threading.local()
+# 临时表名的序号
+_pending_ids = itertools.count()
+# 已经提示过不支持 trigram 的索引，每个进程只提示一次
+_warned = set()
+
+
+def uses_trigram(conn):
+    """索引是否使用 trigram 分词；unicode61 按词切分，中文、日文无法按子串检索"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'cue_fts'").fetchone()
+    return row is not None and "trigram" in row[0]
+
+
+def open_catalog(catalog_path=DEFAULT_CATALOG_PATH):
+    """打开（必要时创建）索引数据库，同一线程内复用连接"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(catalog_path)
+    if conn is None:
+        conn = sqlite3.connect(catalog_path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            conn.executescript(SCHEMA.format(tokenizer="trigram"))
+        except sqlite3.OperationalError:
+            conn.executescript(SCHEMA.format(tokenizer="unicode61"))
+        if not uses_trigram(conn) and catalog_path not in _warned:
+            _warned.add(catalog_path)
+            print(f"警告: 当前 SQLite {sqlite3.sqlite_version} 不支持 trigram 分词，索引 '{catalog_path}' "
+                  f"使用 unicode61 分词，检索将逐行匹配，速度较慢")
+        connections[catalog_path] = conn
+    return conn
+
+
+def track_info(input_file):
+    """返回 (作品文件夹名, 音轨名)"""
+    work = os.path.basename(os.path.dirname(os.path.abspath(input_file)))
+    # "xxx.mp3.vtt" 的音轨名为 "xxx"
+    return work, track_name(input_file)
+
+
+def is_current(catalog_path, input_file):
+    """索引中的记录与文件的大小、修改时间一致时返回 True"""
+    stat = os.stat(input_file)
+    row = open_catalog(catalog_path).execute(
+        "SELECT size, mtime FROM tracks WHERE path = ?", (os.path.abspath(input_file),)
+    ).fetchone()
+    return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+
+def replace_track(conn, input_file, stat, pending):
+    """在一个短事务中替换一个文件的记录：更新文件信息，删除原有的字幕，从 pending 临时表复制新的字幕"""
+    path = os.path.abspath(input_file)
+    work, track = track_info(input_file)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO tracks (path, work, track, size, mtime) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET work = excluded.work, track = excluded.track, "
+            "size = excluded.size, mtime = excluded.mtime",
+            (path, work, track, stat.st_size, stat.st_mtime),
+        )
+        track_id = conn.execute("SELECT id FROM tracks WHERE path = ?", (path,)).fetchone()[0]
+        conn.execute("DELETE FROM cue_rows WHERE track_id = ?", (track_id,))
+        conn.execute(
+            f"INSERT INTO cue_rows (track_id, begin_ms, end_ms, text) "
+            f"SELECT ?, begin_ms, end_ms, text FROM temp.{pending} ORDER BY id",
+            (track_id,),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def insert_rows(conn, pending, rows):
+    conn.executemany(f"INSERT INTO temp.{pending} (begin_ms, end_ms, text) VALUES (?, ?, ?)", rows)
+
+
+def indexed_cues(catalog_path, input_file, cues, stats=None, batch=INDEX_BATCH):
+    """字幕流原样向后传递，同时每 batch 条写入一次临时表，字幕流读完后替换该文件原有的记录
+
+    临时表在 SQLite 单独的临时数据库中（超出缓存时写到临时文件），写入时不占用索引的写锁；
+    转换完成后才在一个短事务中替换该文件的记录，多个进程可以同时建立索引。
+    中途出错或没有读完就被关闭时不修改索引，原有的记录不变。
+    传入 stats 时，写入索引的耗时记录在 stats["index"] 中，每次写入的起止时间加入 stats["spans"]。
+    """
+    if stats is None:
+        stats = {}
+    stats["index"] = 0.0
+    spans = stats.setdefault("spans", [])
+    start = time.time()
+    # 先取文件信息：之后读到的内容对应这个大小和修改时间
+    stat = os.stat(input_file)
+    conn = open_catalog(catalog_path)
+    # 同一线程中可能同时有多个字幕流，各用一个临时表
+    pending = f"pending_rows_{next(_pending_ids)}"
+    conn.execute(f"CREATE TEMP TABLE {pending} (id INTEGER PRIMARY KEY, begin_ms INTEGER, end_ms INTEGER, text TEXT)")
+    end = time.time()
+    stats["index"] += end - start
+    spans.append(("index", start, end))
+
+    rows = []
+    try:
+        for cue in cues:
+            begin_micro, end_micro, text = cue
+            if text:
+                rows.append((begin_micro // 1000, end_micro // 1000, text))
+                if len(rows) >= batch:
+                    start = time.time()
+                    insert_rows(conn, pending, rows)
+                    rows = []
+                    end = time.time()
+                    stats["index"] += end - start
+                    spans.append(("index", start, end))
+            yield cue
+
+        start = time.time()
+        insert_rows(conn, pending, rows)
+        replace_track(conn, input_file, stat, pending)
+        end = time.time()
+        stats["index"] += end - start
+        spans.append(("index", start, end))
+    finally:
+        conn.execute(f"DROP TABLE temp.{pending}")
+
+
+def index_cues(catalog_path, input_file, cues, batch=INDEX_BATCH):
+    """用一个文件的全部字幕替换索引中该文件原有的记录"""
+    for _ in indexed_cues(catalog_path, input_file, cues, batch=batch):
+        pass
+
+
+def search(catalog_path, phrase, limit=50):
+    """返回 [(作品, 音轨, 开始毫秒, 结束毫秒, 文本), ...]"""
+    conn = open_catalog(catalog_path)
+    if len(phrase) >= TRIGRAM_MIN_LENGTH and uses_trigram(conn):
+        # 作为短语检索，检索词中的双引号需要转义
+        query = '"' + phrase.replace('"', '""') + '"'
+        sql = (
+            "SELECT t.work, t.track, c.begin_ms, c.end_ms, c.text "
+            "FROM cue_fts JOIN cue_rows c ON c.id = cue_fts.rowid JOIN tracks t ON t.id = c.track_id "
+            "WHERE cue_fts MATCH ? ORDER BY t.work, t.track, c.begin_ms LIMIT ?"
+        )
+    else:
+        query = "%" + phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        sql = (
+            "SELECT t.work, t.track, c.begin_ms, c.end_ms, c.text "
+            "FROM cue_rows c JOIN tracks t ON t.id = c.track_id "
+            "WHERE c.text LIKE ? ESCAPE '\\' ORDER BY t.work, t.track, c.begin_ms LIMIT ?"
+        )
+    return conn.execute(sql, (query, limit)).fetchall()
+
+
+def format_ms(ms):
+    minutes, ms = divmod(ms, 60000)
+    return f"{minutes:02d}:{ms // 1000:02d}.{ms % 1000:03d}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="在字幕全文索引中检索")
+    parser.add_argument("phrase", help="检索的词句")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help=f"索引数据库路径，默认 {DEFAULT_CATALOG_PATH}")
+    parser.add_argument("-n", "--limit", type=int, default=50, help="最多显示的条数")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.exists(args.catalog):
+        print(f"索引 '{args.catalog}' 不存在，请先用 vtt2lrc_terminal2.py --catalog 转换建立索引。")
+        sys.exit(1)
+
+    results = search(args.catalog, args.phrase, args.limit)
+    if not results:
+        print("没有找到匹配的字幕。")
+        sys.exit(0)
+
+    for work, track, begin_ms, end_ms, text in results:
+        print(f"{work} / {track}  [{format_ms(begin_ms)} - {format_ms(end_ms)}]  ({begin_ms} ms)  {text}")
@@ -0,0 +1,139 @@
+import sys
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+
+from vtt2lrc_memcheck import make_vtt
+from vtt2lrc_batch import parse_size
+from vtt2lrc_stream import convert_vtt_to_lrc, vtt_cues
+from vtt2lrc_catalog import open_catalog
+
+
+# -*- coding: utf-8 -*-
+
+# 转换期间探测写锁的间隔和每次等待的时间（秒）
+PROBE_INTERVAL = 0.02
+PROBE_TIMEOUT = 0.05
+
+# 写锁连续被占用的最长时间占总耗时的比例：只有转换完成后替换记录的短事务占用写锁，
+# 替换的耗时主要是维护全文索引，与机器速度有关，所以按比例设预算。
+# 4M 输入（约 9.5 万条字幕）3 个进程同时建立索引，实测约 0.12，预算留出约 1 倍余量；
+# 整个转换都占用写锁时实测约 0.6
+DEFAULT_MAX_HOLD_RATIO = 0.25
+
+DEFAULT_SIZE = "4M"
+
+
+def run_indexer(input_file, output_file, catalog_path, results):
+    stats = {}
+    ok = convert_vtt_to_lrc(input_file, output_file, catalog_path=catalog_path, stats=stats)
+    results.put((input_file, ok, stats.get("message")))
+
+
+def probe_write_lock(catalog_path, processes):
+    """转换期间反复尝试取得写锁，返回 (写锁连续被占用的最长时间, 尝试次数, 失败次数)"""
+    conn = sqlite3.connect(catalog_path, timeout=PROBE_TIMEOUT, isolation_level=None)
+    longest = 0.0
+    blocked_since = None
+    attempts = failures = 0
+    while any(process.is_alive() for process in processes):
+        attempts += 1
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+            blocked_since = None
+        except sqlite3.OperationalError:
+            failures += 1
+            now = time.perf_counter()
+            if blocked_since is None:
+                blocked_since = now - PROBE_TIMEOUT
+            longest = max(longest, now - blocked_since)
+        time.sleep(PROBE_INTERVAL)
+    conn.close()
+    return longest, attempts, failures
+
+
+def count_rows(catalog_path, input_file):
+    return open_catalog(catalog_path).execute(
+        "SELECT COUNT(*) FROM cue_rows c JOIN tracks t ON t.id = c.track_id WHERE t.path = ?",
+        (os.path.abspath(input_file),),
+    ).fetchone()[0]
+
+
+def count_cues(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return sum(1 for _, _, text in vtt_cues(line.rstrip("\n") for line in f) if text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="并发建立索引的测试：多个进程同时写入同一个索引")
+    parser.add_argument("--size", default=DEFAULT_SIZE, help=f"每个输入文件的大小，默认 {DEFAULT_SIZE}")
+    parser.add_argument("--max-hold-ratio", type=float, default=DEFAULT_MAX_HOLD_RATIO,
+                        help=f"写锁连续被占用的最长时间占总耗时的比例，默认 {DEFAULT_MAX_HOLD_RATIO}")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="vtt2lrc_catalogcheck_")
+    failed = []
+    try:
+        catalog_path = os.path.join(tmpdir, "catalog.sqlite")
+        open_catalog(catalog_path)
+        inputs = []
+        for seed in range(2):
+            work = os.path.join(tmpdir, f"work{seed}")
+            os.mkdir(work)
+            input_file = os.path.join(work, "01.mp3.vtt")
+            with open(input_file, 'w', encoding='utf-8', newline='') as f:
+                f.write(make_vtt(parse_size(args.size), seed))
+            inputs.append(input_file)
+
+        # 两个文件各一个进程，另一个进程同时重新索引第一个文件，检查记录没有重复
+        jobs = [inputs[0], inputs[1], inputs[0]]
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=run_indexer,
+                                    args=(input_file, os.path.join(tmpdir, f"out{i}.lrc"), catalog_path, results))
+            for i, input_file in enumerate(jobs)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        longest, attempts, failures = probe_write_lock(catalog_path, processes)
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+        for _ in jobs:
+            input_file, ok, error = results.get()
+            if not ok:
+                failed.append(f"{input_file} 建立索引失败: {error}")
+
+        print(f"{len(jobs)} 个进程同时建立索引，耗时 {elapsed:.2f} 秒")
+        ratio = longest / elapsed
+        print(f"写锁探测 {attempts} 次，失败 {failures} 次，连续被占用最长 {longest:.2f} 秒，"
+              f"占总耗时 {ratio:.2f}（预算 {args.max_hold_ratio}）")
+        if ratio > args.max_hold_ratio:
+            failed.append(f"写锁连续被占用 {longest:.2f} 秒，占总耗时 {ratio:.2f}，超出预算 {args.max_hold_ratio}")
+
+        for input_file in inputs:
+            expected = count_cues(input_file)
+            actual = count_rows(catalog_path, input_file)
+            print(f"{input_file}: 字幕 {expected} 条，索引 {actual} 条")
+            if actual != expected:
+                failed.append(f"{input_file} 的索引有 {actual} 条，应为 {expected} 条")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if failed:
+        print("-" * 50)
+        for message in failed:
+            print(message)
+        sys.exit(1)
+    print("通过")
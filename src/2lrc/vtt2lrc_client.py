@@ -0,0 +1,98 @@
+import sys
+import os
+import json
+import base64
+import socket
+import getpass
+import argparse
+import tempfile
+
+
+# -*- coding: utf-8 -*-
+
+# 只导入标准库，保证客户端启动足够快；默认值与 vtt2lrc_server 保持一致
+DEFAULT_SOCKET_DIR = os.path.join(tempfile.gettempdir(), f"vtt2lrc-{os.getuid() if hasattr(os, 'getuid') else getpass.getuser()}")
+DEFAULT_SOCKET = os.path.join(DEFAULT_SOCKET_DIR, "vtt2lrc.sock")
+DEFAULT_PORT = 8765
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".vtt2lrc_server_token")
+
+
+def uses_tcp(port):
+    return port is not None or not hasattr(socket, "AF_UNIX")
+
+
+def connect(socket_path=DEFAULT_SOCKET, port=None):
+    if not uses_tcp(port):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection(("127.0.0.1", port or DEFAULT_PORT))
+    return sock
+
+
+def read_token(token_path=DEFAULT_TOKEN_PATH):
+    """读取服务端生成的 TCP 连接令牌"""
+    with open(token_path, 'r', encoding='ascii') as f:
+        return f.read().strip()
+
+
+def request(sock_file, payload):
+    """发送一个请求并读取响应"""
+    sock_file.write(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b"\n")
+    sock_file.flush()
+    line = sock_file.readline()
+    if not line:
+        raise ConnectionError("转换服务断开了连接")
+    return json.loads(line)
+
+
+def convert(payload, socket_path=DEFAULT_SOCKET, port=None, token_path=DEFAULT_TOKEN_PATH):
+    """发送一个转换请求；TCP 连接时自动带上令牌"""
+    if uses_tcp(port):
+        payload = dict(payload, token=read_token(token_path))
+    with connect(socket_path, port) as sock:
+        with sock.makefile('rwb') as sock_file:
+            return request(sock_file, payload)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="向 vtt2lrc_server 发送转换请求")
+    parser.add_argument("mode", choices=["vtt2lrc", "vtt2txt", "lrc2txt"])
+    parser.add_argument("input", help="输入文件，- 表示从标准输入读取")
+    parser.add_argument("output", nargs="?", help="输出文件，省略时结果写到标准输出")
+    parser.add_argument("--clean", action="store_true", help="去除标签和实体，合并空白")
+    parser.add_argument("--fold-width", action="store_true", help="全角英数字和符号转为半角")
+    parser.add_argument("--dedup", action="store_true", help="合并滚动字幕中重复的字幕")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix 套接字路径，默认 {DEFAULT_SOCKET}")
+    parser.add_argument("--port", type=int, help="改为连接 127.0.0.1 的 TCP 端口")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_PATH,
+                        help=f"TCP 连接的令牌文件，默认 {DEFAULT_TOKEN_PATH}")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    payload = {"mode": args.mode, "clean": args.clean, "fold_width": args.fold_width, "dedup": args.dedup}
+    if args.input == "-":
+        payload["data"] = base64.b64encode(sys.stdin.buffer.read()).decode('ascii')
+    else:
+        # 服务端的工作目录可能不同，传绝对路径
+        payload["path"] = os.path.abspath(args.input)
+    if args.output:
+        payload["output"] = os.path.abspath(args.output)
+
+    try:
+        response = convert(payload, args.socket, args.port, args.token_file)
+    except OSError as e:
+        print(f"无法连接转换服务: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not response.get("ok"):
+        print(f"转换失败: {response.get('error')}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        print(f"成功转换: {args.input} -> {args.output}")
+    else:
+        sys.stdout.buffer.write(response["result"].encode('utf-8'))
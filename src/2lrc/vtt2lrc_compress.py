@@ -0,0 +1,70 @@
+import io
+import os
+import importlib
+
+
+# -*- coding: utf-8 -*-
+
+# 支持的压缩格式：后缀 -> 模块名，都是标准库，遇到压缩文件时才导入
+COMPRESSORS = {
+    ".gz": "gzip",
+    ".xz": "lzma",
+    ".bz2": "bz2",
+}
+
+# 命令行中的压缩格式名 -> 后缀
+COMPRESSION_NAMES = {
+    "gz": ".gz",
+    "gzip": ".gz",
+    "xz": ".xz",
+    "bz2": ".bz2",
+}
+
+# 各格式的压缩级别，都取速度优先的值；bz2 的级别只决定分块大小（100KB 的倍数），
+# 字幕文本用最小的分块压缩率相差很小，压缩更快、内存更少
+COMPRESS_LEVELS = {
+    ".gz": {"compresslevel": 6},
+    ".xz": {"preset": 3},
+    ".bz2": {"compresslevel": 1},
+}
+
+
+def split_compression(path):
+    """返回 (去掉压缩后缀的路径, 压缩后缀)，没有压缩时后缀为空字符串"""
+    base, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSORS:
+        return base, ext.lower()
+    return path, ""
+
+
+def compression_suffix(name):
+    """把 gz、xz、bz2 转换为后缀，None 表示不压缩"""
+    if name is None:
+        return ""
+    suffix = COMPRESSION_NAMES.get(name.lower().lstrip("."))
+    if suffix is None:
+        raise ValueError(f"不支持的压缩格式: {name}")
+    return suffix
+
+
+def open_input(path):
+    """以二进制方式打开输入文件，.gz、.xz、.bz2 文件透明解压"""
+    _, suffix = split_compression(path)
+    if suffix:
+        return importlib.import_module(COMPRESSORS[suffix]).open(path, 'rb')
+    return open(path, 'rb')
+
+
+def open_output(path, compression=None):
+    """以 UTF-8 文本方式打开输出文件，指定 compression 时边写边压缩，文件名加上对应后缀
+
+    返回 (文件对象, 实际路径)。
+    """
+    suffix = compression_suffix(compression)
+    if not suffix:
+        return open(path, 'w', encoding='utf-8'), path
+
+    path += suffix
+    binary = importlib.import_module(COMPRESSORS[suffix]).open(path, 'wb', **COMPRESS_LEVELS[suffix])
+    # 与普通文本模式一样转换换行符，解压后的内容与不压缩时完全一致
+    return io.TextIOWrapper(binary, encoding='utf-8'), path
@@ -0,0 +1,366 @@
+import sys
+import os
+import io
+import re
+import bz2
+import gzip
+import lzma
+import random
+import shutil
+import functools
+import difflib
+import tempfile
+import time
+import contextlib
+import importlib
+
+from vtt2lrc_stream import iter_lines, vtt2lrc_stream, convert_vtt_to_lrc, cue_pipeline, write_lrc
+from vtt2lrc_parallel import vtt2lrc_parallel
+from vtt2lrc_retime import retime
+from vtt2lrc_srt import srt_cues
+from vtt2lrc_server import handle_request
+
+
+# -*- coding: utf-8 -*-
+
+# 各代 vtt2lrc 实现，按版本迭代顺序
+GENERATIONS = [
+    "vtt2lrc_init",
+    "vtt2lrc0",
+    "vtt2lrc1",
+    "vtt2lrc2",
+    "vtt2lrc3",
+    "vtt2lrc_terminal",
+    "vtt2lrc_terminal1",
+]
+
+# 作为基准的实现，快速路径的输出必须与它逐字节一致
+REFERENCE = "vtt2lrc_terminal1"
+
+
+def run_stream(vtt, rng=None):
+    """流式路径，输入被随机切成小块模拟管道"""
+    rng = rng or random.Random(0)
+    chunks = []
+    pos = 0
+    while pos < len(vtt):
+        step = rng.randint(1, 64)
+        chunks.append(vtt[pos:pos + step])
+        pos += step
+    out = io.StringIO()
+    vtt2lrc_stream(iter_lines(chunks), out)
+    return out.getvalue()
+
+
+def run_parallel(vtt, rng=None):
+    """并行分块路径，用很小的分块大小强制跨分块拼接"""
+    rng = rng or random.Random(0)
+    fd, path = tempfile.mkstemp(suffix=".vtt")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(vtt.encode('utf-8'))
+        return vtt2lrc_parallel(path, workers=2, chunk_size=rng.randint(1, 256))
+    finally:
+        os.remove(path)
+
+
+def run_file(vtt, rng=None, suffix=".vtt", opener=open):
+    """按文件转换（convert_vtt_to_lrc，不指定 clean、dedup），opener 为写入输入文件的函数，用于生成压缩文件"""
+    tmpdir = tempfile.mkdtemp()
+    try:
+        input_file = os.path.join(tmpdir, "input" + suffix)
+        with opener(input_file, 'wb') as f:
+            f.write(vtt.encode('utf-8'))
+        output_file = os.path.join(tmpdir, "output.lrc")
+        stats = {}
+        if not convert_vtt_to_lrc(input_file, output_file, stats=stats):
+            raise ValueError(f"转换失败: {stats.get('error')}: {stats.get('message')}")
+        with open(output_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_retime(vtt, rng=None):
+    """不改变时间的时间调整（倍数 1、偏移 0），make_retimer 会直接跳过，所以直接传入 retime"""
+    out = io.StringIO()
+    vtt2lrc_stream(iter_lines([vtt]), out, retimer=functools.partial(retime, offset=0, scale=1.0, sync=()))
+    return out.getvalue()
+
+
+SRT_TIME_RE = re.compile(r'(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})')
+
+
+def vtt_to_srt(vtt):
+    """把 VTT 用例改写为 SRT：去掉 WEBVTT 头，时间行改为 时:分:秒,毫秒（SRT 必须有小时）"""
+    lines = vtt.split("\n")
+    if lines and lines[0].rstrip("\r") == "WEBVTT":
+        lines = lines[1:]
+    for i, line in enumerate(lines):
+        if "-->" in line:
+            lines[i] = SRT_TIME_RE.sub(
+                lambda m: f"{int(m.group(1) or 0):02d}:{m.group(2)}:{m.group(3)},{m.group(4)}", line)
+    return "\n".join(lines)
+
+
+def run_srt(vtt, rng=None):
+    """改写为 SRT 后用 SRT 的解析函数转换"""
+    out = io.StringIO()
+    write_lrc(cue_pipeline(iter_lines([vtt_to_srt(vtt)]), parse=srt_cues), out)
+    return out.getvalue()
+
+
+def run_server(vtt, rng=None):
+    """常驻服务处理请求的函数"""
+    return handle_request({"mode": "vtt2lrc", "content": vtt})["result"]
+
+
+# 新增的快速路径，输出必须与 REFERENCE 一致
+FAST_PATHS = {
+    "stream": run_stream,
+    "parallel": run_parallel,
+    "file": run_file,
+    "file-gz": functools.partial(run_file, suffix=".vtt.gz", opener=gzip.open),
+    "file-xz": functools.partial(run_file, suffix=".vtt.xz", opener=lzma.open),
+    "file-bz2": functools.partial(run_file, suffix=".vtt.bz2", opener=bz2.open),
+    "retime": run_retime,
+    "srt": run_srt,
+    "server": run_server,
+}
+
+
+def load_implementations():
+    """返回 {名称: vtt2lrc 函数}"""
+    implementations = {}
+    for name in GENERATIONS:
+        module = importlib.import_module(name)
+        implementations[name] = module.vtt2lrc
+    return implementations
+
+
+def format_vtt_time(ms, hours=True):
+    if hours:
+        return "%02d:%02d:%02d.%03d" % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+    return "%02d:%02d.%03d" % (ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+
+TEXT_SAMPLES = ["这是测试文件", "hello world", "  前后空格  ", "ねえ、聞こえる？", "12", "[a] b", "-- dash"]
+
+
+def random_vtt(rng, max_cues=40, max_hours=30, features=True):
+    """生成随机 VTT，覆盖各代实现行为不同的地方"""
+    newline = rng.choice(["\n", "\r\n"]) if features else "\n"
+    lines = ["WEBVTT", ""]
+    with_settings = features and rng.random() < 0.05
+    t = rng.randint(0, max_hours * 3600000)
+    for idx in range(rng.randint(0, max_cues)):
+        if features and rng.random() < 0.05:
+            lines += [rng.choice(["NOTE 注释块", "NOTE", "STYLE"]), "这里不是字幕", ""]
+        if rng.random() < 0.3:
+            lines.append(str(idx + 1))
+        # 时间行之前的文本
+        if features and rng.random() < 0.1:
+            lines.append(rng.choice(TEXT_SAMPLES))
+        begin = t + rng.randint(0, 5000)
+        end = begin + rng.randint(0, 5000)
+        t = end
+        hours = not features or begin >= 3600000 or rng.random() < 0.5
+        time_line = f"{format_vtt_time(begin, hours)} --> {format_vtt_time(end, hours)}"
+        # 带设置的时间行，旧版本无法解析
+        if with_settings:
+            time_line += " align:start position:10%"
+        lines.append(time_line)
+        # 多行文本或空字幕
+        for _ in range(rng.randint(0 if features else 1, 3)):
+            lines.append(rng.choice(TEXT_SAMPLES))
+        lines += [""] * rng.randint(1, 3 if features else 1)
+    if features and rng.random() < 0.3:
+        lines.pop()
+    return newline.join(lines)
+
+
+def call(func, vtt):
+    """调用实现，吞掉旧版本打印的警告，异常作为结果返回"""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(vtt), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def shrink(vtt, differs):
+    """逐个删除字幕块，找到仍然能复现差异的最小输入"""
+    separator = "\r\n\r\n" if "\r\n" in vtt else "\n\n"
+    blocks = vtt.split(separator)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(1, len(blocks)):
+            candidate = blocks[:i] + blocks[i + 1:]
+            if differs(separator.join(candidate)):
+                blocks = candidate
+                changed = True
+                break
+    return separator.join(blocks)
+
+
+def show_diff(expected, actual, name, reference=REFERENCE):
+    return "".join(difflib.unified_diff(
+        expected.splitlines(True), actual.splitlines(True),
+        fromfile=reference, tofile=name, n=1,
+    ))
+
+
+def compare_fast_paths(vtt, rng, cross):
+    """基准无法处理的输入（如带设置的时间行），快速路径之间互相比较，以第一个为准"""
+    names = list(FAST_PATHS)
+    seeds = {name: rng.random() for name in names}
+
+    def run(name, v):
+        return call(lambda x: FAST_PATHS[name](x, random.Random(seeds[name])), v)
+
+    expected, error = run(names[0], vtt)
+    for name in names[1:]:
+        actual, error2 = run(name, vtt)
+        if error or error2:
+            cross["error"] += 1
+        elif actual == expected:
+            cross["same"] += 1
+            continue
+        else:
+            cross["diff"] += 1
+
+        if cross["example"] is None:
+            def differs(v, name=name):
+                exp, err = run(names[0], v)
+                act, err2 = run(name, v)
+                return (err or err2) is not None or act != exp
+
+            small = shrink(vtt, differs)
+            exp, err = run(names[0], small)
+            act, err2 = run(name, small)
+            cross["example"] = (small, err or err2 or show_diff(exp, act, name, names[0]))
+
+
+def run_cases(cases, seed):
+    implementations = load_implementations()
+    everything = dict(implementations)
+    everything.update(FAST_PATHS)
+    rng = random.Random(seed)
+
+    stats = {name: {"same": 0, "diff": 0, "error": 0, "example": None} for name in everything}
+    cross = {"same": 0, "diff": 0, "error": 0, "example": None}
+    reference_errors = 0
+
+    for _ in range(cases):
+        vtt = random_vtt(rng)
+        expected, error = call(implementations[REFERENCE], vtt)
+        if error:
+            # 基准自己都无法处理的输入不参与和基准的比较，只在快速路径之间比较
+            reference_errors += 1
+            compare_fast_paths(vtt, rng, cross)
+            continue
+
+        for name, func in everything.items():
+            if name == REFERENCE:
+                continue
+            if name in FAST_PATHS:
+                case_seed = rng.random()
+                actual, error = call(lambda v: func(v, random.Random(case_seed)), vtt)
+            else:
+                actual, error = call(func, vtt)
+
+            if error:
+                stats[name]["error"] += 1
+            elif actual == expected:
+                stats[name]["same"] += 1
+                continue
+            else:
+                stats[name]["diff"] += 1
+
+            if stats[name]["example"] is None:
+                def differs(v, func=func):
+                    exp, err = call(implementations[REFERENCE], v)
+                    if err:
+                        return False
+                    act, err2 = call(func, v)
+                    return err2 is not None or act != exp
+
+                small = shrink(vtt, differs)
+                exp, _ = call(implementations[REFERENCE], small)
+                act, err = call(func, small)
+                stats[name]["example"] = (small, err or show_diff(exp, act, name))
+
+    return stats, cross, reference_errors
+
+
+def benchmark(cues, repeat=3):
+    """生成大输入，测量各实现相对基准的速度"""
+    implementations = load_implementations()
+    everything = dict(implementations)
+    everything.update(FAST_PATHS)
+
+    # 不超过 24 小时，否则 datetime 版本无法解析
+    vtt = random_vtt(random.Random(0), max_cues=cues, max_hours=0, features=False)
+    timings = {}
+    for name, func in everything.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _, error = call(func, vtt)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = (best, error)
+    return timings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("Usage: python vtt2lrc_diff.py [cases] [seed] [bench_cues]")
+        sys.exit(0)
+
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    bench_cues = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+
+    stats, cross, reference_errors = run_cases(cases, seed)
+    timings = benchmark(bench_cues)
+    base = timings[REFERENCE][0]
+
+    print(f"随机用例: {cases}，种子: {seed}，基准无法处理: {reference_errors}")
+    print(f"基准实现: {REFERENCE}，性能测试字幕数: {bench_cues}")
+    print(f"{'实现':<20}{'一致':>6}{'不一致':>8}{'异常':>6}{'耗时(s)':>10}{'相对速度':>10}")
+    for name, s in stats.items():
+        elapsed, error = timings[name]
+        speed = "失败" if error else f"{base / elapsed:.2f}x"
+        if name == REFERENCE:
+            print(f"{name:<20}{'-':>6}{'-':>8}{'-':>6}{elapsed:>10.4f}{speed:>10}")
+        else:
+            print(f"{name:<20}{s['same']:>6}{s['diff']:>8}{s['error']:>6}{elapsed:>10.4f}{speed:>10}")
+    fast_names = " / ".join(FAST_PATHS)
+    print(f"基准无法处理的用例中 {fast_names} 互相比较: "
+          f"一致 {cross['same']}，不一致 {cross['diff']}，异常 {cross['error']}")
+
+    failed = False
+    for name, s in stats.items():
+        if s["example"] is None:
+            continue
+        small, detail = s["example"]
+        print("-" * 50)
+        print(f"{name} 与 {REFERENCE} 不一致的最小输入:")
+        print(repr(small))
+        print(detail)
+        if name in FAST_PATHS:
+            failed = True
+
+    if cross["example"] is not None:
+        small, detail = cross["example"]
+        print("-" * 50)
+        print("基准无法处理、快速路径之间不一致的最小输入:")
+        print(repr(small))
+        print(detail)
+        failed = True
+
+    if failed:
+        print("快速路径的输出与基准或彼此不一致")
+        sys.exit(1)
@@ -0,0 +1,126 @@
+import os
+import importlib
+import functools
+
+from vtt2lrc_compress import split_compression
+
+
+# -*- coding: utf-8 -*-
+
+# 各类格式处理函数，按扩展名查找：
+#   cues    读取：行流 -> (开始微秒, 结束微秒, 文本) 字幕流
+#   writer  写出：(字幕流, 文本输出流) -> 写出完整的文件
+#   txt     转为纯文本：(全文, clean) -> 文本，vl2txt 使用；没有时用 cues 取出字幕文本
+# 内置的处理函数写成 "模块:函数"，第一次遇到该格式的文件时才导入模块，
+# 用不到的格式不增加启动时间
+HANDLERS = {
+    "cues": {
+        ".vtt": "vtt2lrc_stream:vtt_cues",
+        ".srt": "vtt2lrc_srt:srt_cues",
+    },
+    "writer": {
+        ".lrc": "vtt2lrc_stream:write_lrc",
+        ".txt": "vtt2lrc_stream:write_txt",
+    },
+    "txt": {},
+}
+
+# 其他已安装的包可以通过 entry point 提供格式，组名为 "vtt2lrc.<类别>"，名称为扩展名，如
+#   [project.entry-points."vtt2lrc.cues"]
+#   ".ass" = "vtt2lrc_ass:ass_cues"
+# 只有遇到内置表中没有的扩展名时才扫描，插件模块同样在用到时才导入
+ENTRY_POINT_GROUP = "vtt2lrc.{kind}"
+
+# "xxx.mp3.vtt" 形式的文件名中，这些扩展名属于音频文件名的一部分
+MEDIA_EXTENSIONS = (".mp3", ".wav")
+
+
+def format_extension(path):
+    """去掉压缩后缀后的扩展名（小写）"""
+    return os.path.splitext(split_compression(path)[0])[1].lower()
+
+
+def track_name(path):
+    """去掉压缩后缀、格式扩展名和 .mp3、.wav 后的文件名（不含文件夹）"""
+    name = os.path.splitext(os.path.basename(split_compression(path)[0]))[0]
+    base, ext = os.path.splitext(name)
+    if ext.lower() in MEDIA_EXTENSIONS:
+        return base
+    return name
+
+
+def output_path(input_file, extension):
+    """生成输出文件名：如果文件名形如 "xxx.mp3.vtt" 或 "xxx.wav.vtt" 则输出 "xxx<extension>" """
+    base_name = os.path.splitext(split_compression(input_file)[0])[0]
+    base2, ext2 = os.path.splitext(base_name)
+    if ext2.lower() in MEDIA_EXTENSIONS:
+        return base2 + extension
+    return base_name + extension
+
+
+def register_handler(kind, extension, handler):
+    """注册格式处理函数，handler 可以是函数，也可以是 "模块:函数" 字符串（用到时才导入）"""
+    HANDLERS[kind][extension.lower()] = handler
+
+
+@functools.lru_cache(maxsize=None)
+def plugin_handlers(kind):
+    """已安装的包通过 entry point 提供的处理函数，返回 {扩展名: EntryPoint}，此时还不导入插件模块"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return {}
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP.format(kind=kind))
+    except TypeError:
+        # Python 3.9 及以前的 entry_points() 不接受参数
+        found = entry_points().get(ENTRY_POINT_GROUP.format(kind=kind), [])
+    handlers = {}
+    for entry_point in found:
+        extension = entry_point.name.lower()
+        if not extension.startswith("."):
+            extension = "." + extension
+        handlers[extension] = entry_point
+    return handlers
+
+
+@functools.lru_cache(maxsize=None)
+def load_handler(target):
+    """导入 "模块:函数" 或 EntryPoint 指向的函数，每个只导入一次"""
+    if isinstance(target, str):
+        module_name, _, attr = target.partition(":")
+        return getattr(importlib.import_module(module_name), attr)
+    return target.load()
+
+
+def lookup(kind, extension):
+    """查找扩展名对应的处理函数、"模块:函数" 或 EntryPoint，只查表，不导入模块；没有时返回 None"""
+    handler = HANDLERS[kind].get(extension)
+    if handler is None:
+        handler = plugin_handlers(kind).get(extension)
+    return handler
+
+
+def find_handler(kind, path, default=None):
+    """按文件的扩展名查找处理函数，没有时返回 default"""
+    handler = lookup(kind, format_extension(path))
+    if handler is None:
+        return default
+    if callable(handler):
+        return handler
+    return load_handler(handler)
+
+
+def supports(kind, path):
+    """是否有该文件格式的处理函数，不导入模块"""
+    return lookup(kind, format_extension(path)) is not None
+
+
+def extensions(*kinds):
+    """这些类别中所有支持的扩展名，按内置、注册、插件的顺序，不重复"""
+    result = []
+    for kind in kinds:
+        for extension in list(HANDLERS[kind]) + list(plugin_handlers(kind)):
+            if extension not in result:
+                result.append(extension)
+    return result
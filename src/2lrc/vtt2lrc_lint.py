@@ -0,0 +1,275 @@
+import sys
+import os
+import re
+import json
+import argparse
+import itertools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from vtt2lrc_terminal1 import parse_time
+from vtt2lrc_stream import iter_file_text, read_file_text, iter_lines, iter_numbered_blocks, split_time_line
+from vtt2lrc_batch import is_vtt_file
+from vtt2lrc_walk import iter_files, DEFAULT_WALK_THREADS
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+
+
+# -*- coding: utf-8 -*-
+
+# 标准的 WebVTT 时间：[时:]分:秒.毫秒
+TIME_RE = re.compile(r'^(?:\d{2,}:)?[0-5]\d:[0-5]\d\.\d{3}$')
+# 标准的时间行一次匹配完，直接取出数字，不必再逐个调用 parse_time
+TIME_PART = r'(?:(\d{2,}):)?([0-5]\d):([0-5]\d)\.(\d{3})'
+TIME_LINE_RE = re.compile(rf'^\s*{TIME_PART}[ \t]+-->[ \t]+{TIME_PART}(?:[ \t]+(.*?))?\s*$')
+
+PERCENT = r'\d+(?:\.\d+)?%'
+# 时间行中结束时间后面的设置，按 WebVTT 规范检查取值
+CUE_SETTINGS = {
+    "vertical": re.compile(r'^(?:rl|lr)$'),
+    "line": re.compile(rf'^(?:-?\d+(?:\.\d+)?|{PERCENT}|auto)(?:,(?:start|center|end))?$'),
+    "position": re.compile(rf'^(?:{PERCENT}|auto)(?:,(?:line-left|center|line-right))?$'),
+    "size": re.compile(rf'^{PERCENT}$'),
+    "align": re.compile(r'^(?:start|center|end|left|right)$'),
+    "region": re.compile(r'^[^\s>]+(?<!-)$'),
+}
+
+# 问题代码 -> (级别, 说明)。error 表示转换会失败或结果明显错误
+ISSUES = {
+    "missing-header": ("warning", "文件不是以 WEBVTT 开头"),
+    "bad-time": ("error", "时间无法解析，转换会失败"),
+    "nonstandard-time": ("warning", "时间格式不标准"),
+    "end-before-begin": ("error", "结束时间早于开始时间"),
+    "non-monotonic": ("warning", "开始时间早于上一条字幕"),
+    "overlap": ("warning", "与上一条字幕时间重叠"),
+    "empty-cue": ("warning", "字幕没有文本"),
+    "text-before-time": ("warning", "时间行之前有多行文本，转换时会被丢弃"),
+    "multiple-time-lines": ("warning", "一个字幕块中有多个时间行，只使用最后一个"),
+    "bad-cue-setting": ("warning", "时间行中的设置无效"),
+    "encoding-fallback": ("warning", "不是 UTF-8，需要检测编码"),
+    "encoding-mismatch": ("warning", "根据开头检测的编码在文件中途解码失败，需要整个文件重新检测"),
+    "decode-error": ("error", "无法解码"),
+    "unreadable": ("error", "无法读取文件"),
+    "no-cues": ("warning", "没有任何字幕"),
+}
+
+# 每个文件最多记录的问题条数，超过的只计数
+MAX_ISSUES_PER_FILE = 50
+
+# 每次交给进程检查的文件数，以及每个进程最多排队的批数。
+# 文件边查找边提交，排队的任务有上限，查找比检查快时也不会把整个目录树的文件都堆在内存中
+LINT_BATCH = 32
+BATCHES_PER_WORKER = 2
+
+
+def check_settings(settings):
+    """返回无效的设置列表"""
+    invalid = []
+    for setting in settings.split():
+        name, sep, value = setting.partition(":")
+        pattern = CUE_SETTINGS.get(name)
+        if not sep or pattern is None or not pattern.match(value):
+            invalid.append(setting)
+    return invalid
+
+
+def check_time(text, number, report):
+    """检查并解析一个时间，无法解析时返回 None"""
+    if not TIME_RE.match(text):
+        try:
+            value = parse_time(text)
+        except (ValueError, IndexError):
+            report("bad-time", number, text)
+            return None
+        report("nonstandard-time", number, text)
+        return value
+    return parse_time(text)
+
+
+def lint_lines(lines, report):
+    """检查行流，通过 report(代码, 行号, 详情) 报告问题，返回字幕条数"""
+    cues = 0
+    last_begin = None
+    last_end = None
+    first = True
+
+    for start, block in iter_numbered_blocks(lines, keep_header=True):
+        if first:
+            first = False
+            # 与转换一致，第一块作为头部跳过
+            if not block[0].lstrip("\ufeff").startswith("WEBVTT"):
+                report("missing-header", start, block[0][:40])
+            continue
+
+        time_index = None
+        for index, line in enumerate(block):
+            if "-->" in line:
+                if time_index is not None:
+                    report("multiple-time-lines", start + index, line)
+                time_index = index
+        if time_index is None:
+            continue
+        if time_index > 1:
+            report("text-before-time", start, block[0][:40])
+
+        cues += 1
+        number = start + time_index
+        time_line = block[time_index]
+
+        if not any(line.strip() for line in block[time_index + 1:]):
+            report("empty-cue", number, time_line.strip())
+
+        match = TIME_LINE_RE.match(time_line)
+        if match:
+            h1, m1, s1, ms1, h2, m2, s2, ms2, settings = match.groups()
+            begin = ((int(h1 or 0) * 60 + int(m1)) * 60 + int(s1)) * 1000000 + int(ms1) * 1000
+            end = ((int(h2 or 0) * 60 + int(m2)) * 60 + int(s2)) * 1000000 + int(ms2) * 1000
+        else:
+            begin_str, end_str = split_time_line(time_line)
+            settings = time_line.partition("-->")[2].strip()[len(end_str):]
+            begin = check_time(begin_str, number, report)
+            end = check_time(end_str, number, report)
+
+        if settings:
+            invalid = check_settings(settings)
+            if invalid:
+                report("bad-cue-setting", number, " ".join(invalid))
+        if begin is None or end is None:
+            continue
+        if end < begin:
+            report("end-before-begin", number, time_line.strip())
+        if last_begin is not None and begin < last_begin:
+            report("non-monotonic", number, time_line.strip())
+        elif last_end is not None and begin < last_end:
+            report("overlap", number, time_line.strip())
+        last_begin = begin
+        last_end = end
+
+    if cues == 0:
+        report("no-cues", 0, "")
+    return cues
+
+
+def lint_file(input_file, cache_path=None):
+    """检查一个文件，返回 {"file", "encoding", "cues", "counts", "issues"}，不生成任何输出文件"""
+    counts = Counter()
+    issues = []
+
+    def report(code, line, detail):
+        counts[code] += 1
+        if len(issues) < MAX_ISSUES_PER_FILE:
+            issues.append({"code": code, "severity": ISSUES[code][0], "line": line, "detail": detail})
+
+    stats = {}
+    cues = 0
+    try:
+        try:
+            cues = lint_lines(iter_lines(iter_file_text(input_file, cache_path, stats)), report)
+        except UnicodeDecodeError:
+            # 已经检查的部分作废，整个文件重新读取、检测编码后再检查一遍
+            counts.clear()
+            issues.clear()
+            report("encoding-mismatch", 0, stats.pop("encoding", ""))
+            cues = lint_lines(iter_lines(read_file_text(input_file, cache_path, stats)), report)
+        if stats.get("encoding", "utf-8") != "utf-8":
+            report("encoding-fallback", 0, stats["encoding"])
+    except OSError as e:
+        report("unreadable", 0, str(e))
+    except Exception as e:
+        report("decode-error", 0, str(e))
+
+    return {"file": input_file, "encoding": stats.get("encoding"), "cues": cues,
+            "counts": dict(counts), "issues": issues}
+
+
+def lint_files(input_files, cache_path=None):
+    """在一个进程中检查一批文件"""
+    return [lint_file(input_file, cache_path) for input_file in input_files]
+
+
+def iter_results(executor, inputs, workers, cache_path=None):
+    """分批提交给进程池检查，按完成顺序返回结果；同时排队的批数不超过 workers * BATCHES_PER_WORKER"""
+    inputs = iter(inputs)
+    pending = set()
+    while True:
+        batch = list(itertools.islice(inputs, LINT_BATCH))
+        if batch:
+            pending.add(executor.submit(lint_files, batch, cache_path))
+        if not pending:
+            break
+        if batch and len(pending) < workers * BATCHES_PER_WORKER:
+            continue
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield from future.result()
+
+
+def iter_inputs(paths, threads=DEFAULT_WALK_THREADS):
+    """命令行中的文件原样返回，文件夹递归查找其中的 .vtt 文件"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_files(path, is_vtt_file, threads)
+        else:
+            yield path
+
+
+def format_result(result):
+    lines = [f"{result['file']}  ({result['cues']} 条字幕)"]
+    for issue in result["issues"]:
+        location = f"行 {issue['line']}" if issue["line"] else "文件"
+        description = ISSUES[issue["code"]][1]
+        detail = f"：{issue['detail']}" if issue["detail"] else ""
+        lines.append(f"  {location} [{issue['severity']}] {issue['code']} {description}{detail}")
+    omitted = sum(result["counts"].values()) - len(result["issues"])
+    if omitted > 0:
+        lines.append(f"  …… 另有 {omitted} 个问题未列出")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检查 vtt 文件的格式问题，不生成任何输出文件")
+    parser.add_argument("paths", nargs="+", help="vtt 文件或文件夹（递归查找）")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，默认为 CPU 核数")
+    parser.add_argument("--format", choices=["text", "json"], default="text",
+                        help="text：按文件列出问题；json：每个文件一行 JSON，最后一行为汇总")
+    parser.add_argument("--all", action="store_true", help="没有问题的文件也列出")
+    parser.add_argument("--encoding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"编码检测缓存（SQLite）的路径，默认 {DEFAULT_CACHE_PATH}")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    totals = Counter()
+    files = 0
+    error_files = 0
+    warning_files = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        inputs = iter_inputs(args.paths)
+        for result in iter_results(executor, inputs, args.workers, args.encoding_cache):
+            files += 1
+            totals.update(result["counts"])
+            severities = {ISSUES[code][0] for code in result["counts"]}
+            if "error" in severities:
+                error_files += 1
+            elif severities:
+                warning_files += 1
+
+            if result["counts"] or args.all:
+                if args.format == "json":
+                    print(json.dumps(result, ensure_ascii=False))
+                else:
+                    print(format_result(result))
+
+    if args.format == "json":
+        print(json.dumps({"summary": {"files": files, "error_files": error_files,
+                                      "warning_files": warning_files, "counts": dict(totals)}},
+                         ensure_ascii=False))
+    else:
+        print(f"共检查 {files} 个文件，有错误的 {error_files} 个，只有警告的 {warning_files} 个")
+        for code, count in totals.most_common():
+            print(f"  {code:<20} {count:>8}  [{ISSUES[code][0]}] {ISSUES[code][1]}")
+
+    if error_files:
+        sys.exit(1)
@@ -0,0 +1,278 @@
+import sys
+import os
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import importlib
+import subprocess
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows 上没有 resource，只记录 tracemalloc 的结果
+    resource = None
+
+from vtt2lrc_diff import format_vtt_time, TEXT_SAMPLES
+from vtt2lrc_batch import parse_size
+
+
+# -*- coding: utf-8 -*-
+
+# vl2txt 的脚本在 2txt 文件夹中
+TXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2txt")
+
+# 各转换路径的内存增长预算：输入每增加 1 字节，峰值内存最多增加多少字节。
+# 预算由默认输入大小（512K、2M、8M）上实测的斜率（每项后面的注释）加 25% 余量得到（保留 1 位小数）；
+# 流式路径实测斜率不超过 0.001，统一取 0.05，即 8M 输入的峰值最多比 512K 输入多约 0.4M。
+# 转换路径改动后斜率变化时，重新测量并按同样的规则更新，不要只把预算调到刚好通过
+BUDGETS = {
+    "terminal1": 13.7,       # 实测 10.97
+    "terminal1-gbk": 14.5,   # 实测 11.57
+    "stream": 0.05,
+    "stream-gbk": 0.05,
+    "stream-catalog": 0.05,
+    "parallel": 4.0,         # 实测 3.22，结果在主进程中拼接完才写出
+    "bilingual": 0.05,
+    "lint": 0.05,
+    "vl2txt": 11.0,          # 实测 8.78
+    "merge": 0.05,
+    "album": 0.05,
+}
+
+DEFAULT_SIZES = "512K,2M,8M"
+
+# parallel 路径的分块大小
+PARALLEL_CHUNK_SIZE = 1024 * 1024
+
+
+def make_vtt(target_size, seed=0):
+    """生成大约 target_size 字节（UTF-8）的 VTT 文本"""
+    rng = random.Random(seed)
+    lines = ["WEBVTT", ""]
+    size = 8
+    t = 0
+    while size < target_size:
+        begin = t + rng.randint(0, 5000)
+        end = begin + rng.randint(0, 5000)
+        t = end
+        text = rng.choice(TEXT_SAMPLES)
+        block = [f"{format_vtt_time(begin)} --> {format_vtt_time(end)}", text, ""]
+        lines += block
+        size += sum(len(line.encode('utf-8')) + 1 for line in block)
+    return "\n".join(lines)
+
+
+def run_terminal1(input_file, workdir):
+    from vtt2lrc_terminal1 import convert_vtt_to_lrc
+    return convert_vtt_to_lrc(input_file, os.path.join(workdir, "out.lrc"))
+
+
+def run_stream(input_file, workdir):
+    from vtt2lrc_stream import convert_vtt_to_lrc
+    return convert_vtt_to_lrc(input_file, os.path.join(workdir, "out.lrc"))
+
+
+def run_stream_catalog(input_file, workdir):
+    from vtt2lrc_stream import convert_vtt_to_lrc
+    return convert_vtt_to_lrc(input_file, os.path.join(workdir, "out.lrc"),
+                              catalog_path=os.path.join(workdir, "catalog.sqlite"))
+
+
+def run_parallel(input_file, workdir):
+    # 分块比默认的小，测试用的输入也会切成多个分块并行解析；只测量主进程（拼接结果），
+    # 子进程每次解析一个分块，内存取决于分块大小
+    from vtt2lrc_parallel import vtt2lrc_parallel
+    lrc = vtt2lrc_parallel(input_file, workers=2, chunk_size=PARALLEL_CHUNK_SIZE)
+    with open(os.path.join(workdir, "out.lrc"), 'w', encoding='utf-8') as f:
+        f.write(lrc)
+    return True
+
+
+def run_bilingual(input_file, workdir):
+    from vtt2lrc_bilingual import merge_tracks
+    merge_tracks([input_file, input_file], os.path.join(workdir, "out.lrc"))
+    return True
+
+
+def run_lint(input_file, workdir):
+    from vtt2lrc_lint import lint_file
+    return lint_file(input_file)["cues"] > 0
+
+
+def run_vl2txt(input_file, workdir):
+    from vl2txt_mergeOutput import convert_to_txt
+    return convert_to_txt(input_file, os.path.join(workdir, "out.txt"))
+
+
+def run_merge(input_file, workdir):
+    from vl2txt_mergeOutput import merge_txt_files
+    return merge_txt_files([input_file, input_file], os.path.join(workdir, "out.txt"))
+
+
+def run_album(input_file, workdir):
+    from vtt2lrc_album import build_album
+    folder = os.path.join(workdir, "album")
+    os.makedirs(folder, exist_ok=True)
+    for number in (1, 2):
+        track = os.path.join(folder, f"{number:02d}.vtt")
+        if not os.path.exists(track):
+            os.symlink(os.path.abspath(input_file), track)
+    return build_album(folder, os.path.join(workdir, "album.lrc")) == 2
+
+
+# 路径名 -> (函数, 输入编码, 用到的模块)。
+# 模块在 tracemalloc 开始前导入，导入时分配的内存不算在转换中
+PATHS = {
+    "terminal1": (run_terminal1, "utf-8", ["vtt2lrc_terminal1"]),
+    "terminal1-gbk": (run_terminal1, "gbk", ["vtt2lrc_terminal1", "chardet"]),
+    "stream": (run_stream, "utf-8", ["vtt2lrc_stream"]),
+    "stream-gbk": (run_stream, "gbk", ["vtt2lrc_stream", "chardet", "vtt2lrc_cache"]),
+    "stream-catalog": (run_stream_catalog, "utf-8", ["vtt2lrc_stream", "vtt2lrc_catalog"]),
+    "parallel": (run_parallel, "utf-8", ["vtt2lrc_parallel"]),
+    "bilingual": (run_bilingual, "utf-8", ["vtt2lrc_bilingual"]),
+    "lint": (run_lint, "utf-8", ["vtt2lrc_lint"]),
+    "vl2txt": (run_vl2txt, "utf-8", ["vl2txt_mergeOutput"]),
+    "merge": (run_merge, "utf-8", ["vl2txt_mergeOutput"]),
+    "album": (run_album, "utf-8", ["vtt2lrc_album"]),
+}
+
+
+def max_rss():
+    """进程的峰值常驻内存（字节）"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def measure(name, input_file, workdir):
+    """在当前进程中运行一个转换路径，返回测量结果"""
+    func, encoding, modules = PATHS[name]
+    if TXT_DIR not in sys.path:
+        sys.path.insert(0, TXT_DIR)
+    for module in modules:
+        importlib.import_module(module)
+    if encoding != "utf-8":
+        # chardet 第一次检测时才导入各语言的模型，先检测一次
+        import chardet
+        chardet.detect("预热编码检测".encode(encoding))
+
+    rss_before = max_rss()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        ok = bool(func(input_file, workdir))
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss_after = max_rss()
+    return {
+        "ok": ok,
+        "peak": peak,
+        "retained": current,
+        "blocks": sys.getallocatedblocks() - blocks_before,
+        "rss_growth": None if rss_before is None else rss_after - rss_before,
+    }
+
+
+def measure_in_subprocess(name, input_file, workdir):
+    """每次测量都在新进程中进行，峰值常驻内存和模块缓存不会互相影响"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", name, input_file, workdir],
+        capture_output=True, text=True, encoding='utf-8',
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} 测量失败: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def growth_factor(points):
+    """输入大小 -> 峰值内存 的最小二乘斜率"""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if var == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+def format_mb(size):
+    return f"{size / 1024 / 1024:.1f}M" if size is not None else "-"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="在 tracemalloc 下测量各转换路径的峰值内存，超出增长预算时失败")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"输入大小，逗号分隔，默认 {DEFAULT_SIZES}")
+    parser.add_argument("--paths", default=",".join(PATHS), help="要测量的路径，逗号分隔，默认全部")
+    parser.add_argument("--json", help="把全部测量结果写入该 JSON 文件")
+    parser.add_argument("--measure", nargs=3, metavar=("PATH", "INPUT", "WORKDIR"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.measure:
+        # 子进程：只测量一次，结果以 JSON 输出
+        print(json.dumps(measure(*args.measure)))
+        sys.exit(0)
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    names = [name for name in args.paths.split(",") if name]
+    for name in names:
+        if name not in PATHS:
+            print(f"未知的路径: {name}，可选: {', '.join(PATHS)}")
+            sys.exit(1)
+
+    tmpdir = tempfile.mkdtemp(prefix="vtt2lrc_memcheck_")
+    results = {}
+    failed = []
+    try:
+        inputs = {}
+        for size in sizes:
+            text = make_vtt(size)
+            for encoding in {PATHS[name][1] for name in names}:
+                path = os.path.join(tmpdir, f"input_{size}_{encoding}.vtt")
+                with open(path, 'w', encoding=encoding, newline='') as f:
+                    f.write(text)
+                inputs[size, encoding] = path
+
+        print(f"{'路径':<16}{'输入':>8}{'峰值':>10}{'残留':>10}{'RSS增长':>10}{'内存块':>10}")
+        for name in names:
+            points = []
+            for size in sizes:
+                input_file = inputs[size, PATHS[name][1]]
+                workdir = tempfile.mkdtemp(dir=tmpdir)
+                measured = measure_in_subprocess(name, input_file, workdir)
+                shutil.rmtree(workdir, ignore_errors=True)
+                results.setdefault(name, []).append(dict(measured, size=os.path.getsize(input_file)))
+                points.append((os.path.getsize(input_file), measured["peak"]))
+                print(f"{name:<16}{format_mb(points[-1][0]):>8}{format_mb(measured['peak']):>10}"
+                      f"{format_mb(measured['retained']):>10}{format_mb(measured['rss_growth']):>10}"
+                      f"{measured['blocks']:>10}")
+                if not measured["ok"]:
+                    failed.append(f"{name} 在 {format_mb(points[-1][0])} 输入上转换失败")
+
+            factor = growth_factor(points)
+            budget = BUDGETS[name]
+            status = "通过" if factor <= budget else "超出预算"
+            print(f"{name:<16}增长 {factor:.3f} 字节/输入字节，预算 {budget}：{status}")
+            if factor > budget:
+                failed.append(f"{name} 的内存增长 {factor:.3f} 超出预算 {budget}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"budgets": BUDGETS, "results": results}, f, ensure_ascii=False, indent=2)
+
+    if failed:
+        print("-" * 50)
+        for message in failed:
+            print(message)
+        sys.exit(1)
@@ -0,0 +1,200 @@
+import sys
+import os
+import time
+from collections import Counter
+
+
+# -*- coding: utf-8 -*-
+
+# 进度显示的最短刷新间隔（秒），避免控制台输出拖慢转换
+PROGRESS_INTERVAL = 0.5
+# Prometheus 文本文件默认的写入间隔（秒）
+METRICS_INTERVAL = 10.0
+# 每个阶段耗时直方图的分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+# 每个文件的转换阶段
+STAGES = ("read", "decode", "convert", "index")
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class BatchReporter:
+    """汇总批量转换的结果：逐文件日志、进度显示、Prometheus 文本文件
+
+    progress 为 True 时用一行不断刷新的进度代替逐文件的成功信息（失败仍然打印）；
+    log_path 指定时逐文件结果写入该文件（带缓冲），不再打印到控制台，失败的原因一并记录；
+    metrics_path 指定时每隔 metrics_interval 秒把计数器和直方图写入该文件，
+    供 node_exporter 的 textfile collector 读取。调用方在等待任务时也要定期调用 tick，
+    每次最长等待 next_tick() 秒，长时间没有文件完成时指标文件仍然按时更新。
+    """
+
+    def __init__(self, jobs, progress=False, log_path=None, metrics_path=None,
+                 metrics_interval=METRICS_INTERVAL, suffix="", stream=None):
+        self.total_files = len(jobs)
+        self.total_bytes = sum(job.size for job in jobs)
+        self.progress = progress
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.suffix = suffix
+        self.stream = stream or sys.stderr
+        self.log = open(log_path, 'w', encoding='utf-8', buffering=1024 * 1024) if log_path else None
+
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.done_bytes = 0
+        self.failures = Counter()
+        self.buckets = {stage: [0] * (len(LATENCY_BUCKETS) + 1) for stage in STAGES}
+        self.latency_sum = dict.fromkeys(STAGES, 0.0)
+        self.latency_count = dict.fromkeys(STAGES, 0)
+
+        self.start = time.monotonic()
+        self.last_progress = 0.0
+        self.last_metrics = self.start
+
+    def add_job(self, job):
+        """边查找边转换时，每发现一个文件调用一次"""
+        self.total_files += 1
+        self.total_bytes += job.size
+
+    def skip_job(self, job):
+        """任务已经完成或由其他节点转换，不计入本次的总数"""
+        self.skipped += 1
+        self.total_files -= 1
+        self.total_bytes -= job.size
+
+    def job_done(self, job, ok, stats):
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            self.failures[stats.get("error", "unknown")] += 1
+        self.done_bytes += job.size
+
+        for stage in STAGES:
+            elapsed = stats.get(stage)
+            if elapsed is None:
+                continue
+            self.latency_sum[stage] += elapsed
+            self.latency_count[stage] += 1
+            index = 0
+            while index < len(LATENCY_BUCKETS) and elapsed > LATENCY_BUCKETS[index]:
+                index += 1
+            self.buckets[stage][index] += 1
+
+        self._log(job, ok, stats.get("message"))
+
+        now = time.monotonic()
+        if self.progress and now - self.last_progress >= PROGRESS_INTERVAL:
+            self.last_progress = now
+            self._show_progress(now)
+        self.tick(now)
+
+    def next_tick(self):
+        """距离下一次写入指标的秒数，不写指标时为 None"""
+        if not self.metrics_path:
+            return None
+        return max(0.0, self.last_metrics + self.metrics_interval - time.monotonic())
+
+    def tick(self, now=None):
+        """到时间时写入指标"""
+        if now is None:
+            now = time.monotonic()
+        if self.metrics_path and now - self.last_metrics >= self.metrics_interval:
+            self.last_metrics = now
+            self.write_metrics()
+
+    def _log(self, job, ok, message=None):
+        if ok:
+            line = f"成功转换: {job.input_file} -> {job.output_file}{self.suffix}"
+        elif message:
+            line = f"转换失败: {job.input_file}: {message}"
+        else:
+            line = f"转换失败: {job.input_file}"
+
+        if self.log is not None:
+            self.log.write(line + "\n")
+        elif not ok:
+            # 进度模式下也要看到失败的文件
+            self._clear_progress()
+            print(line)
+        elif not self.progress:
+            print(line)
+
+    def _clear_progress(self):
+        if self.progress and self.last_progress:
+            self.stream.write("\r\033[K")
+
+    def _show_progress(self, now):
+        done = self.succeeded + self.failed
+        elapsed = max(now - self.start, 1e-9)
+        files_rate = done / elapsed
+        bytes_rate = self.done_bytes / elapsed
+        percent = 100.0 * done / self.total_files if self.total_files else 100.0
+        if self.done_bytes and self.total_bytes:
+            # 按字节估算剩余时间，文件大小差别很大时比按文件数准确
+            eta = format_duration(elapsed * (self.total_bytes - self.done_bytes) / self.done_bytes)
+        else:
+            eta = "--:--"
+        self.stream.write(
+            f"\r[{done}/{self.total_files}] {percent:5.1f}%  "
+            f"{files_rate:.1f} 文件/s  {bytes_rate / 1024 / 1024:.2f} MB/s  "
+            f"失败 {self.failed}  剩余 {eta}\033[K"
+        )
+        self.stream.flush()
+
+    def write_metrics(self):
+        """写入 Prometheus 文本格式，先写临时文件再替换，读取方不会看到写了一半的文件"""
+        lines = [
+            "# HELP vtt2lrc_files_total 已处理的文件数",
+            "# TYPE vtt2lrc_files_total counter",
+            f'vtt2lrc_files_total{{status="ok"}} {self.succeeded}',
+            f'vtt2lrc_files_total{{status="failed"}} {self.failed}',
+            f'vtt2lrc_files_total{{status="skipped"}} {self.skipped}',
+            "# HELP vtt2lrc_files_planned 本次需要处理的文件数",
+            "# TYPE vtt2lrc_files_planned gauge",
+            f"vtt2lrc_files_planned {self.total_files}",
+            "# HELP vtt2lrc_bytes_total 已处理的输入字节数",
+            "# TYPE vtt2lrc_bytes_total counter",
+            f"vtt2lrc_bytes_total {self.done_bytes}",
+            "# HELP vtt2lrc_failures_total 按原因统计的失败数",
+            "# TYPE vtt2lrc_failures_total counter",
+        ]
+        for reason, count in sorted(self.failures.items()):
+            lines.append(f'vtt2lrc_failures_total{{reason="{reason}"}} {count}')
+
+        lines += [
+            "# HELP vtt2lrc_stage_seconds 每个文件各阶段的耗时",
+            "# TYPE vtt2lrc_stage_seconds histogram",
+        ]
+        for stage in STAGES:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, self.buckets[stage]):
+                cumulative += count
+                lines.append(f'vtt2lrc_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            cumulative += self.buckets[stage][-1]
+            lines.append(f'vtt2lrc_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+            lines.append(f'vtt2lrc_stage_seconds_sum{{stage="{stage}"}} {self.latency_sum[stage]}')
+            lines.append(f'vtt2lrc_stage_seconds_count{{stage="{stage}"}} {self.latency_count[stage]}')
+
+        tmp_path = self.metrics_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.metrics_path)
+
+    def close(self):
+        if self.progress:
+            self._show_progress(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
+        if self.metrics_path:
+            self.write_metrics()
+        if self.log is not None:
+            self.log.close()
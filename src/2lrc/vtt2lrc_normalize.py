@@ -0,0 +1,136 @@
+import re
+import html
+from collections import deque
+
+
+# -*- coding: utf-8 -*-
+
+# 一次匹配出标签、实体和连续空白：
+#   <v Speaker>、<c.color>、</i>、<00:00:01.000> 等 WebVTT 标签
+#   连续的空白字符，&nbsp; 也算作空白，与前后的空白合为一个空格
+#   &amp;、&#12354;、&#x3042; 等实体
+CLEAN_RE = re.compile(r'<[^>\n]*>|(?:\s|&nbsp;|&#0*160;|&#[xX]0*[aA]0;)+'
+                      r'|&(#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')
+
+# WebVTT 中常见的实体，直接查表，其余的交给 html.unescape
+ENTITIES = {
+    "amp": "&",
+    "lt": "<",
+    "gt": ">",
+    "quot": '"',
+    "apos": "'",
+    "lrm": "\u200e",
+    "rlm": "\u200f",
+}
+
+# 全角 ASCII 字符转半角，全角空格转普通空格
+FULLWIDTH_TO_HALFWIDTH = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+FULLWIDTH_TO_HALFWIDTH[0x3000] = 0x20
+FULLWIDTH_TABLE = str.maketrans(FULLWIDTH_TO_HALFWIDTH)
+
+
+def _replace(match):
+    text = match.group()
+    if text[0] == "<":
+        return ""
+    name = match.group(1)
+    if name is not None:
+        decoded = ENTITIES.get(name)
+        if decoded is None:
+            decoded = html.unescape(text)
+        return decoded
+    return " "
+
+
+def clean_text(text, fold_width=False):
+    """去除 WebVTT 标签、解码实体、合并空白，可选把全角字符转为半角"""
+    text = CLEAN_RE.sub(_replace, text).strip()
+    if fold_width:
+        text = text.translate(FULLWIDTH_TABLE)
+    return text
+
+
+def fold_fullwidth(text):
+    """只把全角英数字和符号转为半角，不做其他处理"""
+    return text.translate(FULLWIDTH_TABLE)
+
+
+def clean_cues(cues, clean=clean_text):
+    """逐条清理字幕流中的文本"""
+    for begin_micro, end_micro, text in cues:
+        yield begin_micro, end_micro, clean(text)
+
+
+# 滚动字幕去重时，与最近多少条字幕比较是否重复
+DEDUP_WINDOW = 3
+# 上一条的结尾与下一条的开头至少重叠这么多字符，才当作滚动重复去掉
+MIN_OVERLAP = 6
+
+
+def find_overlap(previous, text, min_overlap=MIN_OVERLAP):
+    """previous 的结尾与 text 的开头重叠的最长长度，不足 min_overlap 时返回 0"""
+    if not text:
+        return 0
+    start = max(0, len(previous) - len(text))
+    while True:
+        start = previous.find(text[0], start)
+        if start < 0 or len(previous) - start < min_overlap:
+            return 0
+        if text.startswith(previous[start:]):
+            return len(previous) - start
+        start += 1
+
+
+def dedup_cues(cues, window=DEDUP_WINDOW, min_overlap=MIN_OVERLAP):
+    """合并自动生成字幕（滚动字幕）中重复的字幕，保留最早的开始时间
+
+    - 与最近 window 条中某条完全相同、或是上一条的开头/结尾（至少 min_overlap 个字符）的，并入上一条
+    - 在上一条后面追加文字的，合为一条
+    - 开头与上一条的结尾重叠的（上一行滚动上来、下面出现新的一行），只保留新的部分
+    只比较时间上连续（与前面的字幕重叠或首尾相接）的字幕，中间有空隙的相同字幕
+    （如歌词中重复的副歌）原样保留。
+    只保存一条待输出的字幕和最近几条的文本，内存与字幕数无关。
+    """
+    recent = deque(maxlen=window)
+    pending = None  # [开始, 结束, 输出的文本]
+    last = None  # 上一条字幕的原文本
+    run_end = None  # 当前这段连续字幕的结束时间
+    for begin_micro, end_micro, text in cues:
+        if run_end is None or begin_micro > run_end:
+            # 与前面的字幕之间有空隙，不是滚动字幕的重复，重新开始比较
+            if pending is not None:
+                yield tuple(pending)
+                pending = None
+            recent.clear()
+            run_end = end_micro
+        else:
+            run_end = max(run_end, end_micro)
+
+        if pending is not None:
+            if not text or text in recent or \
+                    (len(text) >= min_overlap and (last.startswith(text) or last.endswith(text))):
+                # 重复的字幕
+                pending[1] = max(pending[1], end_micro)
+                continue
+            if text.startswith(last):
+                # 在上一条后面追加了文字
+                pending[1] = max(pending[1], end_micro)
+                pending[2] += text[len(last):]
+                last = text
+                recent.append(text)
+                continue
+
+            yield tuple(pending)
+            overlap = find_overlap(last, text, min_overlap)
+            last = text
+            recent.append(text)
+            pending = [begin_micro, end_micro, text[overlap:].strip()]
+        elif text:
+            last = text
+            recent.append(text)
+            pending = [begin_micro, end_micro, text]
+        else:
+            yield begin_micro, end_micro, text
+
+    if pending is not None:
+        yield tuple(pending)
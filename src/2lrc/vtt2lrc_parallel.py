@@ -0,0 +1,159 @@
+import sys
+import os
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from vtt2lrc_terminal1 import parse_time, format_time, DEFAULT_THRESHOLD_MICRO
+from vtt2lrc_stream import iter_lines, iter_blocks, iter_cues, write_cues
+from vtt2lrc_stream import convert_vtt_to_lrc as convert_vtt_to_lrc_stream
+from vtt2lrc_compress import split_compression
+
+
+# -*- coding: utf-8 -*-
+
+# 小于该大小的文件直接走串行路径
+PARALLEL_MIN_SIZE = 16 * 1024 * 1024
+# 每个分块的目标大小
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# 寻找分块边界时每次读取的窗口大小
+SCAN_WINDOW = 64 * 1024
+
+# 空行（只含空白字符的行）前面的换行符
+BLANK_LINE_RE = re.compile(rb'\n[ \t\r\f\v]*\n')
+
+
+def find_chunk_bounds(input_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """在字幕块之间的空行处切分文件，返回 [(起始字节, 结束字节), ...]"""
+    size = os.path.getsize(input_file)
+    starts = [0]
+
+    with open(input_file, 'rb') as f:
+        pos = chunk_size
+        while pos < size:
+            # 从目标位置往后找第一个空行，分块从空行开头处开始
+            f.seek(pos)
+            split_at = None
+            while True:
+                window = f.read(SCAN_WINDOW)
+                if not window:
+                    break
+                match = BLANK_LINE_RE.search(window)
+                if match:
+                    split_at = pos + match.start() + 1
+                    break
+                if len(window) < SCAN_WINDOW:
+                    break
+                # 窗口之间保留重叠，防止空行正好被窗口边界切开
+                pos += len(window) - 16
+                f.seek(pos)
+
+            if split_at is None or split_at >= size:
+                break
+            starts.append(split_at)
+            pos = split_at + chunk_size
+
+    ends = starts[1:] + [size]
+    return list(zip(starts, ends))
+
+
+def parse_chunk(input_file, start, end, threshold_micro=DEFAULT_THRESHOLD_MICRO):
+    """解析一个分块，返回 (第一条字幕的开始时间, 分块的 LRC 文本, 最后一条字幕的结束时间)
+
+    分块内第一条字幕前的间隔行取决于上一个分块，由调用方拼接时补上。
+    没有字幕的分块返回 (None, "", None)。
+    """
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        raw_data = f.read(end - start)
+
+    # 分块边界都在换行符之后，按块解码不会截断 UTF-8 字符
+    text = raw_data.decode('utf-8')
+    del raw_data
+
+    cues = iter_cues(iter_blocks(iter_lines([text]), skip_header=(start == 0)))
+    first = next(cues, None)
+    if first is None:
+        return None, "", None
+
+    lrc = io.StringIO()
+    begin_micro, end_micro, first_text = first
+    if first_text:
+        lrc.write(f"[{format_time(begin_micro)}] {first_text}\n")
+    last_end_micro = write_cues(cues, lrc, end_micro, threshold_micro)
+
+    return begin_micro, lrc.getvalue(), last_end_micro
+
+
+def vtt2lrc_parallel(input_file, header=True, threshold_micro=DEFAULT_THRESHOLD_MICRO,
+                     workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """按字幕块边界切分文件并行解析，结果与 vtt2lrc 串行路径逐字节一致"""
+    bounds = find_chunk_bounds(input_file, chunk_size)
+
+    lrc = io.StringIO()
+    if header:
+        lrc.write("[re:vtt2lrc]\n")
+
+    last_end_micro = parse_time("23:59:59.999")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_chunk, input_file, start, end, threshold_micro)
+                   for start, end in bounds]
+
+        # 按顺序拼接，把上一个分块的 last_end 带到下一个分块的第一条字幕
+        for future in futures:
+            first_begin, body, chunk_last_end = future.result()
+            if first_begin is None:
+                continue
+            if first_begin - last_end_micro > threshold_micro:
+                lrc.write(f"[{format_time(last_end_micro)}]\n")
+            lrc.write(body)
+            last_end_micro = chunk_last_end
+
+    # 写入最后的时间
+    lrc.write(f"[{format_time(last_end_micro)}]\n")
+
+    return lrc.getvalue()
+
+
+def convert_vtt_to_lrc_parallel(input_file, output_file, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """大文件并行转换，小文件或非 UTF-8 文件退回流式串行路径"""
+    if split_compression(input_file)[1]:
+        # 压缩文件无法按字节范围切分
+        return convert_vtt_to_lrc_stream(input_file, output_file)
+
+    if os.path.getsize(input_file) < PARALLEL_MIN_SIZE:
+        return convert_vtt_to_lrc_stream(input_file, output_file)
+
+    try:
+        lrc = vtt2lrc_parallel(input_file, workers=workers, chunk_size=chunk_size)
+    except UnicodeDecodeError:
+        # 非 UTF-8 文件需要整体检测编码
+        return convert_vtt_to_lrc_stream(input_file, output_file)
+    except Exception as e:
+        print(f"转换失败: {e}")
+        return False
+
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f_out:
+            f_out.write(lrc)
+        return True
+    except Exception as e:
+        print(f"转换失败: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python vtt2lrc_parallel.py input.vtt output.lrc [workers]")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    if convert_vtt_to_lrc_parallel(input_file, output_file, workers):
+        print(f"成功转换: {input_file} -> {output_file}")
+    else:
+        print(f"转换失败: {input_file}")
+        sys.exit(1)
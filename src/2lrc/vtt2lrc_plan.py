@@ -0,0 +1,76 @@
+import heapq
+
+from vtt2lrc_batch import largest_first, needs_detection
+
+
+# -*- coding: utf-8 -*-
+
+# 按经验值估算的处理速度（字节/秒），用于预估耗时
+PARSE_BYTES_PER_SEC = 4 * 1024 * 1024
+DETECT_BYTES_PER_SEC = 8 * 1024 * 1024
+# 每个文件固定的打开、写入开销（秒）
+PER_FILE_OVERHEAD = 0.002
+
+def estimate_cost(size, detect):
+    """估算一个文件的转换耗时（秒）"""
+    cost = PER_FILE_OVERHEAD + size / PARSE_BYTES_PER_SEC
+    if detect:
+        cost += size / DETECT_BYTES_PER_SEC
+    return cost
+
+
+def lpt_makespan(costs, workers):
+    """按从大到小的顺序把任务分给最先空闲的进程，返回预计总耗时"""
+    loads = [0.0] * max(1, workers)
+    for cost in sorted(costs, reverse=True):
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+def make_plan(jobs, workers):
+    """扫描任务，返回统计信息"""
+    plan = {
+        "files": len(jobs),
+        "bytes": 0,
+        "fallbacks": 0,
+        "unreadable": 0,
+        "serial_seconds": 0.0,
+        "largest": largest_first(jobs)[:5],
+    }
+    costs = []
+    for job in jobs:
+        try:
+            detect = needs_detection(job.input_file)
+        except OSError:
+            plan["unreadable"] += 1
+            continue
+        plan["bytes"] += job.size
+        if detect:
+            plan["fallbacks"] += 1
+        costs.append(estimate_cost(job.size, detect))
+
+    plan["serial_seconds"] = sum(costs)
+    plan["seconds"] = lpt_makespan(costs, workers)
+    plan["workers"] = workers
+    return plan
+
+
+def format_size(size):
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def print_plan(plan):
+    print(f"文件数: {plan['files']}")
+    print(f"总大小: {format_size(plan['bytes'])}")
+    print(f"需要 chardet 检测编码: {plan['fallbacks']}")
+    if plan["unreadable"]:
+        print(f"无法读取: {plan['unreadable']}")
+    print(f"预计耗时: {plan['seconds']:.1f} 秒（{plan['workers']} 个进程，串行约 {plan['serial_seconds']:.1f} 秒）")
+    if plan["largest"]:
+        print("最大的文件:")
+        for job in plan["largest"]:
+            print(f"  {format_size(job.size):>10}  {job.input_file}")
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import heapq
+import pstats
+import cProfile
+import threading
+
+
+# -*- coding: utf-8 -*-
+
+# 时间线中各阶段的名称。流式转换时解析、格式化和写入交替进行，合为一段，
+# 其中穿插的读取、解码和写入索引显示在这一段之下；merge 为合并多个输出文件
+STAGE_LABELS = {
+    "read": "read",
+    "decode": "detect",
+    "convert": "parse/format/write",
+    "index": "index",
+    "merge": "merge",
+}
+
+
+class LoadedProfile:
+    """包装从线程、进程中传回的 cProfile 结果，供 pstats.Stats 读取"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profile_call(stats, func, *args, **kwargs):
+    """在 cProfile 下调用 func，结果放入 stats["profile"]，可以在进程间传递"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profiler.create_stats()
+        stats["profile"] = profiler.stats
+
+
+class BatchProfiler:
+    """收集批量转换的 cProfile 结果和 Chrome 时间线
+
+    profile_path 指定时，汇总所有文件（slowest 指定时只取最慢的 slowest 个文件）
+    在线程、进程中的 cProfile 结果和主进程的调度部分，写入 pstats 格式的文件，
+    可以用 python -m pstats 或 snakeviz 查看。
+    trace_path 指定时，把每个文件及其各阶段（stats["spans"] 中记录的起止时间）
+    按 Chrome trace event 格式边转换边写入，可以在 chrome://tracing 或 Perfetto 中按进程、线程查看。
+    """
+
+    def __init__(self, profile_path=None, slowest=None, trace_path=None):
+        self.profile_path = profile_path
+        self.slowest = slowest
+        self.trace_path = trace_path
+        self.origin = time.time()
+
+        self.merged = pstats.Stats() if profile_path and not slowest else None
+        self.heap = []  # 最慢的 slowest 个文件：(耗时, 序号, 文件, cProfile 结果)
+        self.count = 0
+        self.main = None
+        if profile_path:
+            self.main = cProfile.Profile()
+            self.main.enable()
+
+        self.trace = None
+        self.processes = set()
+        if trace_path:
+            self.trace = open(trace_path, 'w', encoding='utf-8')
+            self.trace.write("[\n")
+            self._event({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "main"}})
+
+    @property
+    def profiling(self):
+        """是否需要在线程、进程中收集 cProfile 结果"""
+        return self.profile_path is not None
+
+    def _ts(self, wall_time):
+        """Chrome trace 的时间单位为微秒，从开始收集时算起"""
+        return round((wall_time - self.origin) * 1000000)
+
+    def _event(self, event):
+        self.trace.write(json.dumps(event, ensure_ascii=False) + ",\n")
+
+    def job_done(self, job, ok, stats):
+        if "start" not in stats:
+            return
+        elapsed = stats["end"] - stats["start"]
+
+        profile = stats.get("profile")
+        if profile is not None:
+            self.count += 1
+            if self.merged is not None:
+                self.merged.add(LoadedProfile(profile))
+            elif len(self.heap) < self.slowest:
+                heapq.heappush(self.heap, (elapsed, self.count, job.input_file, profile))
+            elif elapsed > self.heap[0][0]:
+                heapq.heapreplace(self.heap, (elapsed, self.count, job.input_file, profile))
+
+        if self.trace is not None:
+            self._trace_job(job, ok, stats)
+
+    def _trace_job(self, job, ok, stats):
+        pid, tid = stats["pid"], stats["tid"]
+        if pid not in self.processes:
+            self.processes.add(pid)
+            if pid != os.getpid():
+                self._event({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}})
+
+        start, end = self._ts(stats["start"]), self._ts(stats["end"])
+        self._event({
+            "name": os.path.basename(job.input_file), "cat": "file", "ph": "X",
+            "ts": start, "dur": end - start, "pid": pid, "tid": tid,
+            "args": {"path": job.input_file, "size": job.size, "ok": ok, "error": stats.get("error")},
+        })
+
+        for stage, stage_start, stage_end in stats.get("spans", ()):
+            ts = self._ts(stage_start)
+            self._event({
+                "name": STAGE_LABELS.get(stage, stage), "cat": "stage", "ph": "X",
+                "ts": ts, "dur": self._ts(stage_end) - ts, "pid": pid, "tid": tid,
+            })
+
+    def close(self):
+        """写出 cProfile 汇总结果，结束时间线文件；返回最慢的文件列表 [(耗时, 文件), ...]"""
+        slowest = sorted(((elapsed, path) for elapsed, _, path, _ in self.heap), reverse=True)
+
+        if self.main is not None:
+            self.main.disable()
+            merged = self.merged if self.merged is not None else pstats.Stats()
+            for _, _, _, profile in self.heap:
+                merged.add(LoadedProfile(profile))
+            merged.add(self.main)
+            merged.dump_stats(self.profile_path)
+
+        if self.trace is not None:
+            self._event({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": threading.get_ident(),
+                         "args": {"name": "调度"}})
+            # 最后一个事件后面不能有逗号
+            self.trace.write(json.dumps({"name": "batch", "cat": "batch", "ph": "X", "ts": 0,
+                                         "dur": self._ts(time.time()), "pid": os.getpid(),
+                                         "tid": threading.get_ident()}) + "\n]\n")
+            self.trace.close()
+        return slowest
@@ -0,0 +1,159 @@
+import os
+import json
+import math
+import bisect
+import functools
+from fractions import Fraction
+
+from vtt2lrc_terminal1 import parse_time, format_time
+
+
+# -*- coding: utf-8 -*-
+
+# 作品文件夹中的时间调整配置文件名
+RETIME_FILE = "retime.json"
+
+
+def parse_offset(value):
+    """把 "-1.5"、"+2"、"-00:01.200" 解析为微秒"""
+    value = value.strip()
+    sign = -1 if value.startswith("-") else 1
+    value = value.lstrip("+-")
+    if ":" in value:
+        return sign * parse_time(value)
+    return sign * round(float(value) * 1000000)
+
+
+def check_scale(scale, text):
+    """倍数必须是大于 0 的有限数，否则时间会变成负数或顺序颠倒"""
+    if not math.isfinite(scale) or scale <= 0:
+        raise ValueError(f"倍数必须大于 0: '{text}'")
+    return scale
+
+
+def parse_scale(value):
+    """把 "1.001"、"25/23.976" 解析为倍数"""
+    try:
+        if "/" in value:
+            numerator, denominator = value.split("/", 1)
+            scale = float(numerator) / float(denominator)
+        else:
+            scale = float(value)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"无法解析倍数: '{value}'，格式如 1.001 或 25/23.976")
+    return check_scale(scale, value)
+
+
+def parse_framerate(value):
+    """把 "23.976:25"（字幕原本对应的帧率:实际帧率）解析为倍数"""
+    try:
+        source, target = (Fraction(part) for part in value.split(":", 1))
+        if source <= 0 or target <= 0:
+            raise ValueError
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"无法解析帧率: '{value}'，格式为 原帧率:目标帧率，如 23.976:25，帧率必须大于 0")
+    return float(source) / float(target)
+
+
+def parse_sync(value):
+    """把 "00:10.000=00:11.200,01:00.000=01:02.500" 解析为 [(原时间, 目标时间), ...]（微秒）"""
+    points = []
+    for pair in value.split(","):
+        if not pair.strip():
+            continue
+        source, target = pair.split("=", 1)
+        points.append((parse_time(source), parse_time(target)))
+    return normalize_sync(points)
+
+
+def normalize_sync(points):
+    """按原时间排序；原时间和目标时间都必须严格递增，否则调整后的字幕顺序会颠倒"""
+    points = sorted(points)
+    for (source_a, target_a), (source_b, target_b) in zip(points, points[1:]):
+        if source_a == source_b:
+            raise ValueError("同步点的原时间不能重复")
+        if target_b <= target_a:
+            raise ValueError(f"同步点的目标时间必须随原时间递增: '{format_time(source_a)}={format_time(target_a)}' "
+                             f"与 '{format_time(source_b)}={format_time(target_b)}'")
+    return tuple(points)
+
+
+def retime(time_micro, offset=0, scale=1.0, sync=()):
+    """调整一个时间：先按同步点分段线性映射，再乘以 scale，再加上 offset，结果不小于 0"""
+    if sync:
+        if len(sync) == 1:
+            # 只有一个同步点时相当于平移
+            source, target = sync[0]
+            time_micro += target - source
+        else:
+            # 在同步点之外沿用最近一段的斜率
+            index = bisect.bisect_right(sync, (time_micro, float("inf"))) - 1
+            index = min(max(index, 0), len(sync) - 2)
+            (source_a, target_a), (source_b, target_b) = sync[index], sync[index + 1]
+            time_micro = target_a + (time_micro - source_a) * (target_b - target_a) / (source_b - source_a)
+    if scale != 1.0:
+        time_micro *= scale
+    return max(0, round(time_micro + offset))
+
+
+def make_retimer(offset=0, scale=1.0, sync=()):
+    """根据选项返回时间调整函数，不需要调整时返回 None"""
+    check_scale(scale, scale)
+    sync = normalize_sync(sync)
+    if not offset and scale == 1.0 and not sync:
+        return None
+    # partial 可以被 pickle，能直接传给进程池
+    return functools.partial(retime, offset=offset, scale=scale, sync=sync)
+
+
+def retime_cues(cues, retimer):
+    """对字幕流中每条字幕的开始、结束时间做调整"""
+    for begin_micro, end_micro, text in cues:
+        yield retimer(begin_micro), retimer(end_micro), text
+
+
+def load_retime_settings(path):
+    """读取时间调整配置文件，格式如下（各项都可省略）：
+
+    {"offset": "-1.5", "scale": "25/23.976", "framerate": "23.976:25",
+     "sync": [["00:10.000", "00:11.200"], ["59:00.000", "59:03.000"]]}
+    """
+    with open(path, encoding='utf-8') as f:
+        settings = json.load(f)
+
+    offset = parse_offset(str(settings.get("offset", 0)))
+    scale = parse_scale(str(settings.get("scale", 1)))
+    if "framerate" in settings:
+        scale *= parse_framerate(str(settings["framerate"]))
+    sync = normalize_sync([(parse_time(source), parse_time(target)) for source, target in settings.get("sync", [])])
+    return make_retimer(offset, scale, sync)
+
+
+@functools.lru_cache(maxsize=1024)
+def folder_retimer(folder):
+    """作品文件夹中有 retime.json 时返回对应的时间调整函数，否则返回 None
+
+    同一个进程内每个文件夹只读取一次。
+    """
+    path = os.path.join(folder, RETIME_FILE)
+    if not os.path.isfile(path):
+        return None
+    return load_retime_settings(path)
+
+
+def add_retime_arguments(parser):
+    parser.add_argument("--offset", type=parse_offset, default=0,
+                        help="所有时间平移，如 -1.5（秒）或 +00:01.200")
+    parser.add_argument("--scale", type=parse_scale, default=1.0,
+                        help="所有时间乘以该倍数，如 1.001 或 25/23.976，用于修正采样率不一致造成的漂移")
+    parser.add_argument("--framerate", type=parse_framerate,
+                        help="帧率转换，格式为 原帧率:目标帧率，如 23.976:25")
+    parser.add_argument("--sync", type=parse_sync, default=(),
+                        help="同步点，格式为 原时间=正确时间，多个用逗号分隔；两点之间分段线性调整")
+
+
+def retimer_from_args(args):
+    scale = args.scale
+    if args.framerate is not None:
+        scale *= args.framerate
+    return make_retimer(args.offset, scale, args.sync)
@@ -0,0 +1,227 @@
+import sys
+import os
+import io
+import json
+import hmac
+import stat
+import base64
+import socket
+import secrets
+import getpass
+import argparse
+import tempfile
+import socketserver
+
+import chardet
+
+from vtt2lrc_stream import CONVERTERS, decode_bytes, iter_lines, make_cleaner
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+from vtt2lrc_compress import open_input
+
+
+# -*- coding: utf-8 -*-
+
+# 默认的 Unix 套接字放在每个用户自己的文件夹（权限 0700）中，其他用户无法连接；
+# 不支持 Unix 套接字的系统（Windows）改用本机 TCP 端口，TCP 连接需要令牌
+DEFAULT_SOCKET_DIR = os.path.join(tempfile.gettempdir(), f"vtt2lrc-{os.getuid() if hasattr(os, 'getuid') else getpass.getuser()}")
+DEFAULT_SOCKET = os.path.join(DEFAULT_SOCKET_DIR, "vtt2lrc.sock")
+DEFAULT_PORT = 8765
+# TCP 连接的令牌文件（权限 0600），不存在时服务端生成，客户端读取
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".vtt2lrc_server_token")
+# 默认只允许读写主文件夹中的文件
+DEFAULT_ROOTS = [os.path.expanduser("~")]
+
+
+def check_private(path):
+    """文件或文件夹必须属于当前用户，且其他用户没有任何权限，否则抛出 PermissionError（Windows 上不检查）"""
+    if not hasattr(os, "getuid"):
+        return
+    st = os.lstat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"'{path}' 必须属于当前用户且权限为 0600 或 0700")
+
+
+def make_socket_dir(socket_path):
+    """创建套接字所在的文件夹（权限 0700），已存在时检查所有者和权限"""
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    try:
+        os.mkdir(socket_dir, 0o700)
+    except FileExistsError:
+        if not stat.S_ISDIR(os.lstat(socket_dir).st_mode):
+            raise FileExistsError(f"'{socket_dir}' 已存在且不是文件夹")
+    check_private(socket_dir)
+
+
+def load_token(token_path=DEFAULT_TOKEN_PATH):
+    """读取 TCP 连接的令牌，文件不存在时生成（权限 0600）"""
+    try:
+        fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        check_private(token_path)
+        with open(token_path, 'r', encoding='ascii') as f:
+            return f.read().strip()
+    token = secrets.token_hex(32)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(token + "\n")
+    return token
+
+
+def check_path(path, roots):
+    """路径（解析符号链接后）必须在 roots 中的某个文件夹内，roots 为 None 时不限制"""
+    if roots is None:
+        return path
+    real = os.path.realpath(path)
+    for root in roots:
+        root = os.path.realpath(root)
+        if os.path.commonpath([real, root]) == root:
+            return path
+    raise PermissionError(f"'{path}' 不在允许的文件夹中")
+
+
+def handle_request(request, cache_path=None, roots=None):
+    """处理一个转换请求，返回响应字典
+
+    请求字段：
+        mode: vtt2lrc / vtt2txt / lrc2txt，默认 vtt2lrc
+        path: 输入文件路径；或 data: base64 编码的文件内容；或 content: 已解码的文本
+        output: 可选，结果直接写入该文件，否则在响应的 result 中返回
+        clean, fold_width, dedup: 与命令行的 --clean、--fold-width、--dedup 相同
+        token: TCP 连接的令牌（由 ConvertHandler 检查）
+    指定 roots 时，path 和 output 必须在其中的某个文件夹内。
+    """
+    mode = request.get("mode", "vtt2lrc")
+    if mode not in CONVERTERS:
+        raise ValueError(f"不支持的转换模式: {mode}")
+
+    if "content" in request:
+        text = request["content"]
+    elif "data" in request:
+        text = decode_bytes(base64.b64decode(request["data"]), cache_path)
+    elif "path" in request:
+        with open_input(check_path(request["path"], roots)) as f:
+            text = decode_bytes(f.read(), cache_path)
+    else:
+        raise ValueError("请求中缺少 path、data 或 content")
+
+    clean = make_cleaner(request.get("clean", False), request.get("fold_width", False))
+    dedup = request.get("dedup", False)
+    output_file = request.get("output")
+
+    if output_file:
+        check_path(output_file, roots)
+        with open(output_file, 'w', encoding='utf-8') as f_out:
+            CONVERTERS[mode](iter_lines([text]), f_out, clean=clean, dedup=dedup)
+        return {"ok": True, "output": output_file}
+
+    out = io.StringIO()
+    CONVERTERS[mode](iter_lines([text]), out, clean=clean, dedup=dedup)
+    return {"ok": True, "result": out.getvalue()}
+
+
+class ConvertHandler(socketserver.StreamRequestHandler):
+    """每个连接可以连续发送多个请求，一行一个 JSON"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                token = self.server.token
+                if token is not None and not hmac.compare_digest(str(request.get("token", "")), token):
+                    raise PermissionError("令牌无效")
+                response = handle_request(request, self.server.cache_path, self.server.roots)
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+def remove_stale_socket(socket_path):
+    """删除上次异常退出留下的套接字文件
+
+    路径不是套接字，或者仍有服务在监听时抛出 FileExistsError，不删除。
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"'{socket_path}' 已存在且不是套接字")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        # 没有进程在监听，是残留的套接字文件
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise FileExistsError(f"'{socket_path}' 上已有转换服务在运行")
+
+
+def make_server(socket_path=DEFAULT_SOCKET, port=None, cache_path=None, token_path=DEFAULT_TOKEN_PATH,
+                roots=DEFAULT_ROOTS):
+    """创建多线程服务器，指定 port 或系统不支持 Unix 套接字时监听 127.0.0.1
+
+    Unix 套接字放在权限 0700 的文件夹中；本机的其他用户也能连接 TCP 端口，
+    所以 TCP 请求必须带上 token_path 中的令牌。请求中的文件路径必须在 roots 中的某个文件夹内。
+    """
+    token = None
+    if port is None and hasattr(socket, "AF_UNIX"):
+        make_socket_dir(socket_path)
+        remove_stale_socket(socket_path)
+        server = socketserver.ThreadingUnixStreamServer(socket_path, ConvertHandler)
+    else:
+        token = load_token(token_path)
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", port or DEFAULT_PORT), ConvertHandler)
+    server.daemon_threads = True
+    server.cache_path = cache_path
+    server.token = token
+    server.roots = roots
+    return server
+
+
+def warm_up():
+    """chardet 的各个检测器在第一次检测时才加载，启动时先跑一次"""
+    chardet.detect("预热编码检测".encode('gbk'))
+    chardet.detect("エンコード検出".encode('shift_jis'))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="常驻转换服务，避免每个文件都重新启动 Python")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix 套接字路径，默认 {DEFAULT_SOCKET}")
+    parser.add_argument("--port", type=int, help="改为监听 127.0.0.1 的 TCP 端口，请求需要带上令牌")
+    parser.add_argument("--token-file", default=DEFAULT_TOKEN_PATH,
+                        help=f"TCP 连接的令牌文件（权限 0600，不存在时生成），默认 {DEFAULT_TOKEN_PATH}")
+    parser.add_argument("--root", action="append",
+                        help="允许读写的文件夹，可以指定多次，默认只允许主文件夹")
+    parser.add_argument("--encoding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"编码检测缓存（SQLite）的路径，默认 {DEFAULT_CACHE_PATH}")
+    parser.add_argument("--no-encoding-cache", dest="encoding_cache", action="store_const", const=None,
+                        help="不使用编码检测缓存")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    warm_up()
+    try:
+        server = make_server(args.socket, args.port, args.encoding_cache, args.token_file, args.root or DEFAULT_ROOTS)
+    except OSError as e:
+        print(f"启动失败: {e}")
+        sys.exit(1)
+    address = server.server_address
+    print(f"转换服务已启动: {address}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        print("转换服务已停止")
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import socket
+import uuid
+import hashlib
+import threading
+
+
+# -*- coding: utf-8 -*-
+
+# 认领记录默认放在目标文件夹下的这个子文件夹中
+CLAIMS_DIR = ".vtt2lrc_claims"
+# 认领的有效期（秒）。持有者每隔有效期的 1/3 续期一次，超过有效期没有续期的认领视为节点已退出
+DEFAULT_LEASE = 300.0
+
+
+def parse_shard(text):
+    """把 "0/4" 解析为 (0, 4)，序号从 0 开始"""
+    try:
+        index, count = (int(part) for part in text.split("/", 1))
+    except ValueError:
+        raise ValueError(f"无法解析分片: '{text}'，格式为 序号/总数，如 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片序号应在 0 到 {count - 1} 之间: '{text}'")
+    return index, count
+
+
+def job_key(root, input_file):
+    """文件相对于目标文件夹的路径的哈希，挂载位置不同的节点也能得到相同的结果"""
+    relative = os.path.relpath(os.path.abspath(input_file), os.path.abspath(root))
+    return hashlib.blake2b(relative.replace(os.sep, "/").encode('utf-8'), digest_size=8).hexdigest()
+
+
+def filter_shard(jobs, root, shard):
+    """只保留属于分片 shard=(序号, 总数) 的任务，各节点的分片互不重叠且合起来覆盖全部文件"""
+    index, count = shard
+    for job in jobs:
+        if int(job_key(root, job.input_file), 16) % count == index:
+            yield job
+
+
+def file_signature(input_file):
+    stat = os.stat(input_file)
+    return stat.st_size, stat.st_mtime
+
+
+class LeaseClaims:
+    """通过共享文件系统上的锁文件认领任务，节点可以随时加入或退出
+
+    每个文件对应 <claims_dir>/<哈希>.lock 和 <哈希>.done：
+    创建 .lock 认领，转换结束后写入 .done 并删除 .lock。
+    .done 中记录了文件的大小和修改时间，文件变化后会重新转换。
+    节点退出后它的 .lock 不再续期，超过有效期后其他节点可以接手。
+    各节点的时钟偏差应远小于有效期。
+
+    每个 .lock 中写有唯一的令牌，只有令牌不变时才删除、续期锁文件：
+    打破过期的锁时先改名，再确认改走的仍是原来那个锁，不是时放回原处；
+    原处已经有新的锁（放回有冲突）时保留改名后的文件（.contested），不删除任何一方的锁。
+    持有者在转换前、续期和完成时都确认锁文件中仍是自己的令牌。
+    """
+
+    def __init__(self, root, claims_dir=None, lease=DEFAULT_LEASE):
+        self.root = root
+        self.claims_dir = claims_dir or os.path.join(root, CLAIMS_DIR)
+        os.makedirs(self.claims_dir, exist_ok=True)
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.held = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat = threading.Thread(target=self._renew, daemon=True)
+        self.heartbeat.start()
+
+    def _paths(self, input_file):
+        key = job_key(self.root, input_file)
+        return os.path.join(self.claims_dir, key + ".lock"), os.path.join(self.claims_dir, key + ".done")
+
+    def _is_done(self, done_path, input_file):
+        try:
+            with open(done_path, encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False
+        try:
+            return [record["size"], record["mtime"]] == list(file_signature(input_file))
+        except (OSError, KeyError):
+            return False
+
+    def _private_path(self, lock_path, suffix):
+        return f"{lock_path}.{self.owner.replace(':', '.')}.{uuid.uuid4().hex}.{suffix}"
+
+    def _create(self, lock_path):
+        """创建锁文件，成功时返回其中的令牌，已存在时返回 None
+
+        先写好临时文件再硬链接为 lock_path，其他节点看到的锁文件总是带有完整的令牌。
+        """
+        token = f"{self.owner}:{uuid.uuid4().hex}"
+        tmp_path = self._private_path(lock_path, "tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(token)
+        try:
+            os.link(tmp_path, lock_path)
+        except FileExistsError:
+            return None
+        except OSError:
+            # 不支持硬链接的文件系统退回 O_EXCL 创建，写入令牌前的瞬间锁文件是空的
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                return None
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(token)
+        finally:
+            os.remove(tmp_path)
+        return token
+
+    def _read_token(self, path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def _take(self, lock_path, token):
+        """锁文件中是 token 时删除它并返回 True；锁文件已经不存在时返回 None
+
+        先改名再确认：改名是原子的，改走后其他节点无法再改动这个文件。
+        改走的不是 token（检查之后被其他节点替换了）时放回原处，返回 False。
+        """
+        taken_path = self._private_path(lock_path, "stale")
+        try:
+            os.rename(lock_path, taken_path)
+        except FileNotFoundError:
+            return None
+        if self._read_token(taken_path) == token:
+            os.remove(taken_path)
+            return True
+        self._restore(taken_path, lock_path)
+        return False
+
+    def _restore(self, taken_path, lock_path):
+        """把误改走的锁文件放回原处；原处已经有新的锁时两个都可能有节点在用，保留改名后的文件"""
+        try:
+            os.link(taken_path, lock_path)
+        except FileExistsError:
+            contested_path = taken_path[:-len(".stale")] + ".contested"
+            os.rename(taken_path, contested_path)
+            print(f"警告: 认领 '{lock_path}' 有冲突，原来的锁文件保留为 '{contested_path}'")
+            return
+        except OSError:
+            # 不支持硬链接的文件系统，原处没有锁文件时改名放回
+            if os.path.exists(lock_path):
+                contested_path = taken_path[:-len(".stale")] + ".contested"
+                os.rename(taken_path, contested_path)
+                print(f"警告: 认领 '{lock_path}' 有冲突，原来的锁文件保留为 '{contested_path}'")
+            else:
+                os.rename(taken_path, lock_path)
+            return
+        os.remove(taken_path)
+
+    def _break_stale(self, lock_path):
+        """删除超过有效期的锁文件；返回 True 时可以再尝试创建
+
+        修改时间和令牌从同一个打开的文件读取，之后只有令牌不变时才删除，
+        同时发现的多个节点中，其他节点的新锁不会被误删。
+        """
+        try:
+            with open(lock_path, encoding='utf-8') as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime < self.lease:
+                    return False
+                token = f.read()
+        except FileNotFoundError:
+            # 其他节点刚好完成或接手了，再尝试一次创建即可
+            return True
+        return self._take(lock_path, token) is not False
+
+    def _owns(self, lock_path, token):
+        try:
+            return self._read_token(lock_path) == token
+        except OSError:
+            return False
+
+    def claim(self, job):
+        """认领成功返回 True；已经完成或其他节点正在转换时返回 False"""
+        lock_path, done_path = self._paths(job.input_file)
+        if self._is_done(done_path, job.input_file):
+            return False
+        token = self._create(lock_path)
+        if token is None:
+            if not self._break_stale(lock_path):
+                return False
+            token = self._create(lock_path)
+            if token is None:
+                return False
+        # 检查和加锁之间其他节点可能刚好完成
+        if self._is_done(done_path, job.input_file):
+            self._take(lock_path, token)
+            return False
+        # 转换前确认锁没有被打破过期锁的节点改走
+        if not self._owns(lock_path, token):
+            return False
+        with self.lock:
+            self.held[job.input_file] = (lock_path, token)
+        return True
+
+    def finish(self, job, ok):
+        """记录转换结果并释放认领；失败的文件同样记为完成，不会被其他节点反复重试
+
+        锁文件中已经不是自己的令牌时（认领被接手），只记录结果，不删除别人的锁。
+        """
+        lock_path, done_path = self._paths(job.input_file)
+        try:
+            size, mtime = file_signature(job.input_file)
+        except OSError:
+            size, mtime = None, None
+        record = {"path": job.input_file, "ok": ok, "size": size, "mtime": mtime,
+                  "owner": self.owner, "time": time.time()}
+        tmp_path = self._private_path(done_path, "tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, done_path)
+
+        with self.lock:
+            held = self.held.pop(job.input_file, None)
+        if held is not None:
+            self._take(*held)
+
+    def _touch(self, lock_path, token):
+        """锁文件中仍是 token 时更新修改时间；令牌和修改时间针对同一个打开的文件"""
+        try:
+            with open(lock_path, 'r+', encoding='utf-8') as f:
+                if f.read() != token:
+                    return False
+                if os.utime in os.supports_fd:
+                    os.utime(f.fileno())
+                else:
+                    os.utime(lock_path)
+                return True
+        except OSError:
+            return False
+
+    def _renew(self):
+        while not self.stopped.wait(self.lease / 3):
+            with self.lock:
+                held = list(self.held.items())
+            for input_file, (lock_path, token) in held:
+                if not self._touch(lock_path, token):
+                    # 认领已经被接手，不再续期，避免让别人的锁一直有效
+                    with self.lock:
+                        if self.held.get(input_file) == (lock_path, token):
+                            del self.held[input_file]
+
+    def close(self):
+        """停止续期，释放还没完成的认领（例如被中断时），其他节点可以立即接手"""
+        self.stopped.set()
+        self.heartbeat.join()
+        with self.lock:
+            held = list(self.held.values())
+            self.held.clear()
+        for lock_path, token in held:
+            try:
+                self._take(lock_path, token)
+            except OSError:
+                pass
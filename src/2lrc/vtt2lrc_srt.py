@@ -0,0 +1,31 @@
+from vtt2lrc_terminal1 import parse_time
+from vtt2lrc_stream import iter_blocks, split_time_line
+
+
+# -*- coding: utf-8 -*-
+
+def parse_srt_time(time_str):
+    """SRT 的时间形如 00:01:02,500，毫秒用逗号分隔"""
+    return parse_time(time_str.replace(",", "."))
+
+
+def srt_cues(lines):
+    """从 SRT 行流中解析出 (开始微秒, 结束微秒, 文本)
+
+    SRT 没有头部，每块为序号行、时间行和文本行；时间行之前的序号不算作文本。
+    """
+    for block in iter_blocks(lines, skip_header=False):
+        time_line = None
+        text_lines = []
+        for line in block:
+            if "-->" in line:
+                time_line = line
+            elif time_line is not None:
+                text_lines.append(line.strip())
+
+        if time_line is None:
+            continue
+
+        # 结束时间后面可能有 X1:... 坐标，与 VTT 的设置一样丢弃
+        begin_str, end_str = split_time_line(time_line)
+        yield parse_srt_time(begin_str), parse_srt_time(end_str), ' '.join(text_lines)
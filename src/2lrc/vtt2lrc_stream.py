@@ -0,0 +1,523 @@
+import sys
+import io
+import re
+import time
+import codecs
+import argparse
+import functools
+from operator import itemgetter
+
+from vtt2lrc_terminal1 import parse_time, format_time, DEFAULT_THRESHOLD_MICRO
+from vtt2lrc_normalize import clean_text, clean_cues, fold_fullwidth, dedup_cues
+from vtt2lrc_compress import open_input, open_output
+from vtt2lrc_formats import find_handler
+
+# chardet、编码缓存（sqlite3）、全文索引和时间调整只在用到时才在函数中导入，
+# vtt2lrc_formats 按格式导入本模块时不增加启动时间
+
+
+# -*- coding: utf-8 -*-
+
+# 每次从输入读取的字节数
+CHUNK_SIZE = 64 * 1024
+# 根据文件开头猜测编码时读取的字节数
+PREFIX_SIZE = 64 * 1024
+
+LRC_TAG_RE = re.compile(r'\[.*?\]')
+# LRC 行首的时间标签 [分:秒.百分秒]
+LRC_TIME_RE = re.compile(r'^\s*\[(\d+):(\d+(?:\.\d+)?)\]')
+
+# 以这些词开头的块不是字幕，整块跳过
+SKIP_BLOCK_TOKENS = ("NOTE", "STYLE", "REGION")
+
+
+def iter_decoded(stream, encoding='utf-8', chunk_size=CHUNK_SIZE, flush=None, prefix=b""):
+    """从二进制流中分块读取并增量解码，产出文本块；prefix 为已经从流中读出的开头部分"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    text = decoder.decode(prefix)
+    if text:
+        yield text
+    # read1 有多少返回多少，不会等凑满 chunk_size，管道中可以尽早输出
+    read = getattr(stream, 'read1', stream.read)
+    while True:
+        # 阻塞读取之前先把已经生成的结果刷出去
+        if flush is not None:
+            flush()
+        data = read(chunk_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_lines(chunks):
+    """按 "\\n" 切分文本块流，逐行产出（结果与 str.split("\\n") 一致）"""
+    tail = ""
+    for chunk in chunks:
+        parts = (tail + chunk).split("\n")
+        tail = parts.pop()
+        yield from parts
+    yield tail
+
+
+def is_skip_block(line):
+    """根据块的第一个词判断是否为 NOTE、STYLE、REGION 块"""
+    if not line.startswith(SKIP_BLOCK_TOKENS):
+        return False
+    return line.split(None, 1)[0] in SKIP_BLOCK_TOKENS
+
+
+def iter_numbered_blocks(lines, skip_header=True, keep_header=False):
+    """按空行把行流切分成字幕块，产出 (第一行的行号, 块中的行)，行号从 1 开始
+
+    默认跳过第一块（WEBVTT 头部），keep_header 时原样产出头部块，供检查 WEBVTT 标记。
+    NOTE、STYLE、REGION 块只看第一行就整块跳过，不保存其中的行。
+    """
+    block = []
+    start = 0
+    in_block = False
+    skipping = False
+    header_pending = skip_header
+    for number, line in enumerate(lines, 1):
+        if line.strip() == "":
+            if in_block:
+                if not skipping:
+                    yield start, block
+                    block = []
+                in_block = False
+        elif in_block:
+            if not skipping:
+                block.append(line)
+        else:
+            # 新块的第一行
+            in_block = True
+            start = number
+            if header_pending:
+                header_pending = False
+                skipping = not keep_header
+            else:
+                skipping = is_skip_block(line)
+            if not skipping:
+                block.append(line)
+
+    if in_block and not skipping:
+        yield start, block
+
+
+def iter_blocks(lines, skip_header=True):
+    """按空行把行流切分成字幕块，默认跳过第一块（WEBVTT 头部）"""
+    return map(itemgetter(1), iter_numbered_blocks(lines, skip_header))
+
+
+def split_time_line(time_line):
+    """把时间行拆成开始、结束时间字符串，丢弃结束时间后面的设置（align:start 等）"""
+    begin_str, _, rest = time_line.partition("-->")
+    parts = rest.split(None, 1)
+    end_str = parts[0] if parts else ""
+    return begin_str.strip(), end_str
+
+
+def iter_cues(blocks):
+    """从字幕块流中解析出 (开始微秒, 结束微秒, 文本)，语义与 vtt2lrc_terminal1.vtt2lrc 一致"""
+    for block in blocks:
+        time_line = None
+        text_lines = []
+        for line in block:
+            if "-->" in line:
+                time_line = line
+            elif time_line is not None:
+                # 只收集时间行之后的文本
+                text_lines.append(line.strip())
+
+        if time_line is None:
+            continue
+
+        begin_str, end_str = split_time_line(time_line)
+        yield parse_time(begin_str), parse_time(end_str), ' '.join(text_lines)
+
+
+def vtt_cues(lines):
+    """VTT 行流 -> 字幕流"""
+    return iter_cues(iter_blocks(lines))
+
+
+def write_cues(cues, out, last_end_micro, threshold_micro=DEFAULT_THRESHOLD_MICRO, time_format=format_time):
+    """把字幕流逐条写成 LRC 行，返回最后一条字幕的结束时间"""
+    for begin_micro, end_micro, text in cues:
+        # 检查阈值
+        if begin_micro - last_end_micro > threshold_micro:
+            out.write(f"[{time_format(last_end_micro)}]\n")
+
+        if text:
+            out.write(f"[{time_format(begin_micro)}] {text}\n")
+
+        last_end_micro = end_micro
+
+    return last_end_micro
+
+
+def write_lrc(cues, out, header=True, threshold_micro=DEFAULT_THRESHOLD_MICRO):
+    """把字幕流写成完整的 LRC"""
+    if header:
+        out.write("[re:vtt2lrc]\n")
+
+    last_end_micro = write_cues(cues, out, parse_time("23:59:59.999"), threshold_micro)
+
+    # 写入最后的时间
+    out.write(f"[{format_time(last_end_micro)}]\n")
+
+
+def write_txt(cues, out):
+    """把字幕流写成纯文本，每条字幕一行，没有文本的字幕跳过"""
+    for _, _, text in cues:
+        if text:
+            out.write(text + "\n")
+
+
+def cue_pipeline(lines, clean=None, retimer=None, parse=vtt_cues, dedup=False):
+    """行流 -> 字幕流，clean 为逐条处理字幕文本的函数，retimer 为调整时间的函数
+
+    parse 为输入格式的解析函数（见 vtt2lrc_formats），默认按 VTT 解析。
+    dedup 为 True 时合并滚动字幕中重复的字幕；比较前需要去掉行内时间戳等标签，
+    没有指定 clean 时使用 clean_text。
+    """
+    cues = parse(lines)
+    if retimer is not None:
+        from vtt2lrc_retime import retime_cues
+        cues = retime_cues(cues, retimer)
+    if dedup and clean is None:
+        clean = clean_text
+    if clean is not None:
+        cues = clean_cues(cues, clean)
+    if dedup:
+        cues = dedup_cues(cues)
+    return cues
+
+
+def vtt2lrc_stream(lines, out, header=True, threshold_micro=DEFAULT_THRESHOLD_MICRO, clean=None,
+                   retimer=None, dedup=False):
+    """流式 VTT -> LRC"""
+    write_lrc(cue_pipeline(lines, clean, retimer, dedup=dedup), out, header, threshold_micro)
+
+
+def vtt2txt_texts(lines, clean=None):
+    """VTT 行流 -> 文本流，语义与 vl2txt 中的 vtt2txt 一致"""
+    for block in iter_blocks(lines):
+        # 跳过序号行（纯数字）和时间行（包含-->）
+        text_lines = []
+        for line in block:
+            if not (line.strip().isdigit() or "-->" in line):
+                text_lines.append(line.strip())
+
+        if text_lines:
+            text = ' '.join(text_lines)
+            if clean is not None:
+                text = clean(text)
+            if text:
+                yield text
+
+
+def lrc2txt_texts(lines, clean=None):
+    """LRC 行流 -> 文本流，语义与 vl2txt 中的 lrc2txt 一致"""
+    for line in lines:
+        clean_line = LRC_TAG_RE.sub('', line).strip()
+        if clean is not None:
+            clean_line = clean(clean_line)
+        if clean_line:
+            yield clean_line
+
+
+def lrc_cues(lines):
+    """从 LRC 行流中解析出 (开始微秒, 结束微秒, 文本)
+
+    开始时间为行首的时间标签，结束时间为下一个时间标签（包括只有时间、没有文本的行），
+    最后一行的结束时间等于开始时间。没有时间标签的行（如 [re:...]）跳过。
+    """
+    pending = None
+    for line in lines:
+        match = LRC_TIME_RE.match(line)
+        if not match:
+            continue
+        begin_micro = int(match.group(1)) * 60000000 + round(float(match.group(2)) * 1000000)
+        if pending is not None:
+            yield pending[0], begin_micro, pending[1]
+        text = LRC_TAG_RE.sub('', line).strip()
+        pending = (begin_micro, text) if text else None
+    if pending is not None:
+        yield pending[0], pending[0], pending[1]
+
+
+def write_texts(texts, out):
+    for text in texts:
+        out.write(text + "\n")
+
+
+def vtt2txt_stream(lines, out, clean=None, dedup=False):
+    """流式 VTT -> TXT，语义与 vl2txt 中的 vtt2txt 一致
+
+    dedup 为 True 时按字幕的时间合并重复的字幕（与 vtt2lrc --dedup 相同），
+    此时逐条字幕取出文本，时间行之前的文本不会输出。
+    """
+    if dedup:
+        write_txt(cue_pipeline(lines, clean, dedup=True), out)
+    else:
+        write_texts(vtt2txt_texts(lines, clean), out)
+
+
+def lrc2txt_stream(lines, out, clean=None, dedup=False):
+    """流式 LRC -> TXT，语义与 vl2txt 中的 lrc2txt 一致；dedup 为 True 时按时间标签合并重复的行"""
+    if dedup:
+        write_txt(cue_pipeline(lines, clean, parse=lrc_cues, dedup=True), out)
+    else:
+        write_texts(lrc2txt_texts(lines, clean), out)
+
+
+CONVERTERS = {
+    "vtt2lrc": vtt2lrc_stream,
+    "vtt2txt": vtt2txt_stream,
+    "lrc2txt": lrc2txt_stream,
+}
+
+
+def convert_stream(mode, instream, outstream, encoding='utf-8', clean=None, dedup=False):
+    """从二进制输入流读取，转换结果写入文本输出流，内存占用与文件大小无关"""
+    converter = CONVERTERS[mode]
+    chunks = iter_decoded(instream, encoding, flush=outstream.flush)
+    converter(iter_lines(chunks), outstream, clean=clean, dedup=dedup)
+    outstream.flush()
+
+
+def make_cleaner(clean=False, fold_width=False):
+    """根据选项返回字幕文本清理函数，不需要清理时返回 None"""
+    if not clean and not fold_width:
+        return None
+    if not clean:
+        # 只转换全角字符，不去除标签、不合并空白
+        return fold_fullwidth
+    # partial 可以被 pickle，能直接传给进程池
+    return functools.partial(clean_text, fold_width=fold_width)
+
+
+def decode_bytes(raw_data, cache_path=None, stats=None):
+    """先尝试 UTF-8，失败时用 chardet 检测编码
+
+    指定 cache_path 时，检测结果按内容哈希保存，同样的内容下次不再检测。
+    传入 stats 字典时，实际使用的编码记录在 stats["encoding"] 中。
+    """
+    if stats is None:
+        stats = {}
+    try:
+        text = raw_data.decode('utf-8')
+        stats["encoding"] = 'utf-8'
+        return text
+    except UnicodeDecodeError:
+        pass
+
+    import chardet
+    from vtt2lrc_cache import content_hash, lookup_encoding, store_encoding
+
+    digest = None
+    if cache_path is not None:
+        digest = content_hash(raw_data)
+        cached = lookup_encoding(cache_path, digest)
+        if cached is not None:
+            try:
+                text = raw_data.decode(cached[0])
+                stats["encoding"] = cached[0]
+                return text
+            except (UnicodeDecodeError, LookupError):
+                # 缓存的结果不可用，重新检测
+                pass
+
+    # 使用 chardet 检测编码
+    result = chardet.detect(raw_data)
+    encoding = result['encoding']
+    if encoding is None:
+        raise ValueError("无法检测文件编码。")
+    text = raw_data.decode(encoding)
+    stats["encoding"] = encoding
+
+    if digest is not None:
+        store_encoding(cache_path, digest, encoding, result['confidence'])
+    return text
+
+
+def detect_encoding(prefix, cache_path=None):
+    """根据文件开头猜测编码：先尝试 UTF-8，失败时用 chardet 检测
+
+    指定 cache_path 时，检测结果按开头内容的哈希保存。文件不超过 PREFIX_SIZE 时
+    开头就是全部内容，与 decode_bytes 共用同一条缓存记录。
+    """
+    try:
+        # 开头可能截断在多字节字符中间，用增量解码器判断
+        codecs.getincrementaldecoder('utf-8')().decode(prefix)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    import chardet
+    from vtt2lrc_cache import content_hash, lookup_encoding, store_encoding
+
+    digest = None
+    if cache_path is not None:
+        digest = content_hash(prefix)
+        cached = lookup_encoding(cache_path, digest)
+        if cached is not None:
+            try:
+                codecs.lookup(cached[0])
+                return cached[0]
+            except LookupError:
+                pass
+
+    result = chardet.detect(prefix)
+    encoding = result['encoding']
+    if encoding is None:
+        raise ValueError("无法检测文件编码。")
+
+    if digest is not None:
+        store_encoding(cache_path, digest, encoding, result['confidence'])
+    return encoding
+
+
+def record_stage(stats, stage, start):
+    """记录从 start（time.time()）到现在的一个阶段：耗时存入 stats[stage]，起止时间加入 stats["spans"]"""
+    end = time.time()
+    stats[stage] = end - start
+    stats.setdefault("spans", []).append((stage, start, end))
+
+
+def iter_file_text(input_file, cache_path=None, stats=None):
+    """逐块读取并解码文件，内存占用与文件大小无关
+
+    编码根据开头 PREFIX_SIZE 字节猜测，之后增量解码；猜测的编码在文件中途
+    解码失败时抛出 UnicodeDecodeError，由调用方整个文件重新读取。
+    """
+    with open_input(input_file) as f:
+        start = time.time()
+        prefix = f.read(PREFIX_SIZE)
+        if stats is not None:
+            record_stage(stats, "read", start)
+
+        start = time.time()
+        encoding = detect_encoding(prefix, cache_path)
+        if stats is not None:
+            record_stage(stats, "decode", start)
+            stats["encoding"] = encoding
+
+        yield from iter_decoded(f, encoding, prefix=prefix)
+
+
+def read_file_text(input_file, cache_path=None, stats=None):
+    """整个文件读入后检测编码并解码，作为一个文本块产出"""
+    start = time.time()
+    with open_input(input_file) as f:
+        raw_data = f.read()
+    if stats is not None:
+        record_stage(stats, "read", start)
+
+    start = time.time()
+    text = decode_bytes(raw_data, cache_path, stats)
+    del raw_data
+    if stats is not None:
+        record_stage(stats, "decode", start)
+    yield text
+
+
+def convert_vtt_to_lrc(input_file, output_file, clean=None, cache_path=None, catalog_path=None,
+                       compression=None, stats=None, retimer=None, dedup=False):
+    """与 vtt2lrc_terminal1.convert_vtt_to_lrc 相同，但逐块读取、逐条字幕流式写出
+
+    非 UTF-8 文件根据开头检测编码后增量解码，只有中途解码失败时才整个文件重新读取、检测。
+    指定 catalog_path 时，同时把字幕写入全文索引（文件没有变化时跳过）。
+    输入可以是 .vtt.gz 等压缩文件；指定 compression（gz、xz、bz2）时输出边写边压缩。
+    retimer 为 vtt2lrc_retime.make_retimer 返回的时间调整函数。
+    dedup 为 True 时合并自动生成字幕（滚动字幕）中重复的字幕，输出和索引都会变小。
+    输入、输出格式按扩展名在 vtt2lrc_formats 中查找，如 .srt 输入、.txt 输出；
+    不认识的输入扩展名按 VTT 解析，不认识的输出扩展名写成 LRC。
+    传入 stats 字典时，记录各阶段耗时（read、decode、convert、index，单位秒），
+    各阶段每一段的 (阶段, 开始, 结束)（time.time()）按顺序记录在 spans 中，
+    失败时在 error 中记录异常类型、message 中记录异常信息，由调用方报告（不传入 stats 时直接打印）。
+    流式读取时 read、decode 只包括开头部分，其余的读取和解码算在 convert 中。
+    """
+    report = stats is None
+    if stats is None:
+        stats = {}
+    try:
+        index = False
+        if catalog_path is not None:
+            from vtt2lrc_catalog import is_current
+            index = not is_current(catalog_path, input_file)
+        parse = find_handler("cues", input_file, vtt_cues)
+        writer = find_handler("writer", output_file, write_lrc)
+        index_path = catalog_path if index else None
+        try:
+            write_lrc_file(iter_file_text(input_file, cache_path, stats), output_file,
+                           clean, compression, stats, retimer, index_path, parse, writer, dedup, input_file)
+        except UnicodeDecodeError:
+            # 开头猜测的编码不适用于整个文件，已写出的部分和索引都作废，重新转换
+            write_lrc_file(read_file_text(input_file, cache_path, stats), output_file,
+                           clean, compression, stats, retimer, index_path, parse, writer, dedup, input_file)
+        return True
+    except Exception as e:
+        stats["error"] = type(e).__name__
+        stats["message"] = str(e)
+        if report:
+            print(f"转换失败: {e}")
+        return False
+
+
+def write_lrc_file(chunks, output_file, clean, compression, stats, retimer, catalog_path=None, parse=vtt_cues,
+                   writer=write_lrc, dedup=False, input_file=None):
+    """把文本块流转换为 LRC（或 writer 对应的格式）写入 output_file
+
+    指定 catalog_path 时，字幕边写出边分批写入 input_file 的全文索引。
+    """
+    # 字幕是边解析边写出的，解析和写入合在一起计时
+    start = time.time()
+    cues = cue_pipeline(iter_lines(chunks), clean, retimer, parse, dedup)
+    if catalog_path is not None:
+        from vtt2lrc_catalog import indexed_cues
+        cues = indexed_cues(catalog_path, input_file, cues, stats)
+
+    try:
+        f_out, output_file = open_output(output_file, compression)
+        with f_out:
+            try:
+                writer(cues, f_out)
+            finally:
+                if catalog_path is not None:
+                    # 写出失败时立即丢弃缓存的字幕，不等生成器被回收
+                    cues.close()
+    finally:
+        # 时间线上的转换阶段包含其中穿插的读取、解码和写入索引；中途失败、重新转换时两段都记录
+        end = time.time()
+        stats.setdefault("spans", []).append(("convert", start, end))
+    stats["convert"] = end - start - stats.get("read", 0) - stats.get("decode", 0) - stats.get("index", 0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="管道模式：从标准输入读取，结果写到标准输出")
+    parser.add_argument("mode", choices=list(CONVERTERS))
+    parser.add_argument("encoding", nargs="?", default='utf-8', help="输入编码，默认 utf-8")
+    parser.add_argument("--clean", action="store_true",
+                        help="去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体，合并空白")
+    parser.add_argument("--fold-width", action="store_true", help="全角英数字和符号转为半角")
+    parser.add_argument("--dedup", action="store_true",
+                        help="合并自动生成字幕（滚动字幕）中重复的字幕，保留最早的开始时间")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline="\n")
+    try:
+        convert_stream(args.mode, sys.stdin.buffer, out, args.encoding,
+                       make_cleaner(args.clean, args.fold_width), args.dedup)
+    except Exception as e:
+        print(f"转换失败: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -2,7 +2,6 @@ import sys
 import os
 import glob
 import shutil
-import chardet
 from datetime import datetime, timedelta
 import io
 
@@ -121,7 +120,8 @@ def convert_vtt_to_lrc(input_file, output_file):
             try:
                 vtt = raw_data.decode('utf-8')
             except UnicodeDecodeError:
-                # 使用 chardet 检测编码
+                # 使用 chardet 检测编码；用到时才导入，作为模块导入（vtt2lrc_stream 等）时不加载
+                import chardet
                 result = chardet.detect(raw_data)
                 encoding = result['encoding']
                 if encoding is None:
@@ -157,29 +157,25 @@ if __name__ == "__main__":
         print(f"路径 '{folder_path}' 无效或不是文件夹。")
         sys.exit(1)
 
-    # 递归查找所有.vtt文件
-    vtt_files = []
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".vtt"):
-                vtt_files.append(os.path.join(root, file))
+    from vtt2lrc_walk import iter_files
+    from vtt2lrc_formats import output_path
 
-    if not vtt_files:
-        print("该文件夹及子文件夹中没有找到 .vtt 文件。")
-        sys.exit(0)
+    # 递归查找所有.vtt文件，多线程并行列目录，找到一个转换一个
+    vtt_files = iter_files(folder_path, lambda name: name.lower().endswith(".vtt"))
+    found = 0
 
     for vtt_file in vtt_files:
+        found += 1
         # 生成输出文件名：如果文件名形如 "xxx.mp3.vtt" 或 "xxx.wav.vtt" 则输出 "xxx.lrc"
-        base_name = os.path.splitext(vtt_file)[0]  # 去除最后一个扩展名 ".vtt"
-        base2, ext2 = os.path.splitext(base_name)
-        if ext2.lower() in [".mp3", ".wav"]:
-            output_file = base2 + ".lrc"
-        else:
-            output_file = base_name + ".lrc"
+        output_file = output_path(vtt_file, ".lrc")
 
         if convert_vtt_to_lrc(vtt_file, output_file):
             print(f"成功转换: {vtt_file} -> {output_file}")
         else:
             print(f"转换失败: {vtt_file}")
 
+    if not found:
+        print("该文件夹及子文件夹中没有找到 .vtt 文件。")
+        sys.exit(0)
+
     print("所有文件转换完成")
\ No newline at end of file
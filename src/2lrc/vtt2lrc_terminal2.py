@@ -0,0 +1,154 @@
+import sys
+import os
+import argparse
+
+from vtt2lrc_batch import find_vtt_files, make_jobs, iter_jobs, run_batch, parse_size
+from vtt2lrc_plan import make_plan, print_plan
+from vtt2lrc_stream import make_cleaner
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+from vtt2lrc_catalog import DEFAULT_CATALOG_PATH
+from vtt2lrc_compress import compression_suffix
+from vtt2lrc_metrics import BatchReporter, METRICS_INTERVAL
+from vtt2lrc_retime import add_retime_arguments, retimer_from_args
+from vtt2lrc_walk import DEFAULT_WALK_THREADS
+from vtt2lrc_shard import parse_shard, filter_shard, LeaseClaims, DEFAULT_LEASE, CLAIMS_DIR
+from vtt2lrc_formats import lookup
+from vtt2lrc_profile import BatchProfiler
+
+
+# -*- coding: utf-8 -*-
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="将目标文件夹下所有vtt文件并行转换为lrc文件")
+    parser.add_argument("folder_path", help="存放目标文件的文件夹")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，默认为 CPU 核数")
+    parser.add_argument("--executor", choices=["auto", "process", "thread"], default="auto",
+                        help="auto（默认）：小的 UTF-8 文件用线程转换，大文件和需要检测编码的文件用进程；"
+                             "process、thread：全部使用一种")
+    parser.add_argument("--threads", type=int,
+                        help="线程池的线程数，默认为进程数的 4 倍")
+    parser.add_argument("--walk-threads", type=int, default=DEFAULT_WALK_THREADS,
+                        help=f"同时列出的文件夹数，网络存储上可以调大，默认 {DEFAULT_WALK_THREADS}")
+    parser.add_argument("--max-memory", type=parse_size,
+                        help="同时转换的文件估算内存总和上限，如 512M、2G；大文件会自动排队")
+    parser.add_argument("--plan", action="store_true",
+                        help="只扫描并报告文件数、大小、编码回退和预计耗时，不进行转换")
+    parser.add_argument("--clean", action="store_true",
+                        help="去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体，合并空白")
+    parser.add_argument("--fold-width", action="store_true", help="全角英数字和符号转为半角")
+    parser.add_argument("--dedup", action="store_true",
+                        help="合并自动生成字幕（滚动字幕）中重复的字幕，保留最早的开始时间")
+    parser.add_argument("--encoding-cache", default=DEFAULT_CACHE_PATH,
+                        help=f"编码检测缓存（SQLite）的路径，默认 {DEFAULT_CACHE_PATH}")
+    parser.add_argument("--no-encoding-cache", dest="encoding_cache", action="store_const", const=None,
+                        help="不使用编码检测缓存")
+    parser.add_argument("--to", default="lrc",
+                        help="输出格式的扩展名，默认 lrc；内置 lrc、txt，已安装的插件可以提供其他格式")
+    parser.add_argument("--compress", choices=["gz", "xz", "bz2"],
+                        help="输出的 lrc 文件边写边压缩")
+    parser.add_argument("--catalog", nargs="?", const=DEFAULT_CATALOG_PATH,
+                        help=f"转换的同时把字幕写入全文索引（SQLite FTS5），默认位置 {DEFAULT_CATALOG_PATH}")
+    parser.add_argument("--shard", type=parse_shard,
+                        help="多台机器分工：只转换按路径哈希分到第 i 片（共 N 片）的文件，格式为 i/N，i 从 0 开始")
+    parser.add_argument("--claim", action="store_true",
+                        help="多台机器分工：通过共享文件系统上的锁文件认领文件，节点可以随时加入或退出")
+    parser.add_argument("--claims-dir",
+                        help=f"认领记录的位置（所有节点必须相同），默认为目标文件夹下的 {CLAIMS_DIR}")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                        help=f"认领的有效期（秒），节点退出后超过该时间其他节点才能接手，默认 {DEFAULT_LEASE:g}")
+    add_retime_arguments(parser)
+    parser.add_argument("--progress", action="store_true",
+                        help="显示进度、吞吐量和预计剩余时间，不再逐个打印成功的文件")
+    parser.add_argument("--log", help="逐文件的转换结果写入该文件，不打印到控制台")
+    parser.add_argument("--metrics",
+                        help="定期写入 Prometheus 文本格式的指标文件（供 node_exporter textfile collector 读取）")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help=f"指标文件的写入间隔（秒），默认 {METRICS_INTERVAL:g}")
+    parser.add_argument("--profile",
+                        help="在各进程中对每个文件做 cProfile，汇总后写入该文件（pstats 格式）；此时全部使用进程池")
+    parser.add_argument("--profile-slowest", type=int, metavar="N",
+                        help="配合 --profile，只汇总最慢的 N 个文件，并列出这些文件")
+    parser.add_argument("--trace",
+                        help="把每个文件的读取、编码检测、转换、索引各阶段写成 Chrome trace event 格式的时间线")
+    args = parser.parse_args(argv)
+    if args.profile_slowest is not None and not args.profile:
+        parser.error("--profile-slowest 需要同时指定 --profile")
+    args.to = "." + args.to.lower().lstrip(".")
+    if lookup("writer", args.to) is None:
+        parser.error(f"不支持的输出格式: {args.to}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    folder_path = args.folder_path
+
+    if not os.path.isdir(folder_path):
+        print(f"路径 '{folder_path}' 无效或不是文件夹。")
+        sys.exit(1)
+
+    if args.plan:
+        jobs = make_jobs(find_vtt_files(folder_path, args.walk_threads), args.to)
+        if args.shard is not None:
+            jobs = list(filter_shard(jobs, folder_path, args.shard))
+        if not jobs:
+            print("该文件夹及子文件夹中没有找到 .vtt 文件。")
+            sys.exit(0)
+        print_plan(make_plan(jobs, args.workers))
+        sys.exit(0)
+
+    # 边查找边转换，不必等整个目录树遍历结束
+    jobs = iter_jobs(folder_path, args.walk_threads, args.to)
+    if args.shard is not None:
+        jobs = filter_shard(jobs, folder_path, args.shard)
+    claims = LeaseClaims(folder_path, args.claims_dir, args.lease) if args.claim else None
+
+    reporter = BatchReporter(
+        [],
+        progress=args.progress,
+        log_path=args.log,
+        metrics_path=args.metrics,
+        metrics_interval=args.metrics_interval,
+        suffix=compression_suffix(args.compress),
+    )
+    profiler = None
+    if args.profile or args.trace:
+        profiler = BatchProfiler(args.profile, args.profile_slowest, args.trace)
+    succeeded, failed = run_batch(
+        jobs,
+        args.workers,
+        max_memory=args.max_memory,
+        reporter=reporter,
+        claims=claims,
+        executor=args.executor,
+        thread_workers=args.threads,
+        profiler=profiler,
+        clean=make_cleaner(args.clean, args.fold_width),
+        dedup=args.dedup,
+        cache_path=args.encoding_cache,
+        catalog_path=args.catalog,
+        compression=args.compress,
+        retimer=retimer_from_args(args),
+    )
+
+    if profiler is not None:
+        slowest = profiler.close()
+        if args.profile:
+            print(f"cProfile 结果已写入: {args.profile}")
+        if slowest:
+            print(f"最慢的 {len(slowest)} 个文件:")
+            for elapsed, path in slowest:
+                print(f"  {elapsed:8.3f}s  {path}")
+        if args.trace:
+            print(f"时间线已写入: {args.trace}")
+
+    if reporter.total_files == 0 and reporter.skipped == 0:
+        print("该文件夹及子文件夹中没有找到 .vtt 文件。")
+        sys.exit(0)
+
+    if reporter.skipped:
+        print(f"所有文件转换完成，成功 {succeeded} 个，失败 {failed} 个，"
+              f"跳过 {reporter.skipped} 个（已完成或由其他节点转换）")
+    else:
+        print(f"所有文件转换完成，成功 {succeeded} 个，失败 {failed} 个")
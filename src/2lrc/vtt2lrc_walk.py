@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# -*- coding: utf-8 -*-
+
+# 同时列出的文件夹数。列目录主要在等待网络存储（SMB、NFS）返回，线程数可以远多于 CPU 核数
+DEFAULT_WALK_THREADS = 16
+
+
+def scan_dir(path, match=None, with_size=False, probe=None):
+    """列出一个文件夹，返回 (子文件夹列表, 文件列表)
+
+    与 os.walk 一样，指向文件夹的符号链接不进入也不算作文件；无法访问的文件夹当作空文件夹。
+    match 为按文件名筛选的函数；with_size 为 True 时文件列表为 [(路径, 大小), ...]，
+    大小在列目录的线程中读取，网络存储上也能并行。
+    同时指定 probe 时对每个文件调用 probe(路径)（如读取文件开头），
+    文件列表为 [(路径, 大小, probe 的结果), ...]，同样在列目录的线程中进行。
+    """
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        dirs.append(entry.path)
+                    continue
+                if match is not None and not match(entry.name):
+                    continue
+                if with_size:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = 0
+                    if probe is None:
+                        files.append((entry.path, size))
+                    else:
+                        files.append((entry.path, size, probe(entry.path)))
+                else:
+                    files.append(entry.path)
+    except OSError:
+        pass
+    return dirs, files
+
+
+def iter_files(folder_path, match=None, threads=DEFAULT_WALK_THREADS, with_size=False, probe=None):
+    """多线程并行遍历文件夹，找到文件就立即返回，顺序不固定
+
+    适合边查找边转换：第一个文件夹列完就可以开始转换，不必等整个目录树遍历结束。
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = {executor.submit(scan_dir, folder_path, match, with_size, probe)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirs, files = future.result()
+                for subdir in dirs:
+                    pending.add(executor.submit(scan_dir, subdir, match, with_size, probe))
+                yield from files
+
+
+def walk_files(folder_path, match=None, threads=DEFAULT_WALK_THREADS):
+    """多线程并行遍历文件夹，返回的文件顺序与 os.walk 逐个遍历时完全相同"""
+    listings = {}
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = {executor.submit(scan_dir, folder_path, match): folder_path}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                listings[path] = future.result()
+                for subdir in listings[path][0]:
+                    pending[executor.submit(scan_dir, subdir, match)] = subdir
+
+    # 按 os.walk 的顺序（先当前文件夹的文件，再依次进入子文件夹）拼接
+    files = []
+    stack = [folder_path]
+    while stack:
+        dirs, dir_files = listings[stack.pop()]
+        files.extend(dir_files)
+        stack.extend(reversed(dirs))
+    return files
@@ -2,16 +2,25 @@ import sys
 import os
 import glob
 import shutil
-import chardet
 import re
+import codecs
+import time
+import threading
 from datetime import datetime, timedelta
 import io
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2lrc"))
+from vtt2lrc_stream import make_cleaner, decode_bytes, cue_pipeline, write_txt, lrc_cues, record_stage
+from vtt2lrc_formats import register_handler, find_handler, format_extension, extensions
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+from vtt2lrc_walk import walk_files
+from vtt2lrc_compress import split_compression, open_input, open_output, compression_suffix
+
 
 # -*- coding: utf-8 -*-
 
-def vtt2txt(vtt_content):
-    """将VTT内容转换为纯文本"""
+def vtt2txt(vtt_content, clean=None):
+    """将VTT内容转换为纯文本，clean 为逐条处理字幕文本的函数"""
     txt = io.StringIO()
 
     lines = vtt_content.split("\n")
@@ -43,12 +52,16 @@ def vtt2txt(vtt_content):
         # 如果块中有文本内容，则添加到输出
         if text_lines:
             # 将多行文本合并为一行（用空格分隔）
-            txt.write(' '.join(text_lines) + "\n")
+            text = ' '.join(text_lines)
+            if clean is not None:
+                text = clean(text)
+            if text:
+                txt.write(text + "\n")
 
     return txt.getvalue()
 
 
-def lrc2txt(lrc_content):
+def lrc2txt(lrc_content, clean=None):
     """将LRC内容转换为纯文本"""
     txt = io.StringIO()
 
@@ -56,6 +69,8 @@ def lrc2txt(lrc_content):
     for line in lines:
         # 使用正则表达式移除所有方括号及其内容
         clean_line = re.sub(r'\[.*?\]', '', line).strip()
+        if clean is not None:
+            clean_line = clean(clean_line)
 
         # 如果处理后还有内容，则写入输出
         if clean_line:
@@ -64,34 +79,57 @@ def lrc2txt(lrc_content):
     return txt.getvalue()
 
 
-def convert_to_txt(input_file, output_file):
+# 内置的纯文本转换函数，其他格式在 vtt2lrc_formats 中查找
+register_handler("txt", ".vtt", vtt2txt)
+register_handler("txt", ".lrc", lrc2txt)
+
+
+def convert_to_txt(input_file, output_file, clean=None, cache_path=None, compression=None, dedup=False, stats=None):
+    """dedup 为 True 时按字幕的时间合并自动生成字幕（滚动字幕）中重复的行
+
+    传入 stats 时记录读取、解码、转换（含写出）各阶段的耗时和起止时间，同 vtt2lrc_stream.convert_vtt_to_lrc。
+    """
+    if stats is None:
+        stats = {}
     try:
-        with open(input_file, 'rb') as f:
+        # 输入可以是 .vtt.gz 等压缩文件
+        start = time.time()
+        with open_input(input_file) as f:
             raw_data = f.read()
+        record_stage(stats, "read", start)
 
-            # 尝试使用 UTF-8 解码
-            try:
-                content = raw_data.decode('utf-8')
-            except UnicodeDecodeError:
-                # 使用 chardet 检测编码
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-                if encoding is None:
-                    raise ValueError("无法检测文件编码。")
-                content = raw_data.decode(encoding)
-
-        # 根据文件扩展名选择转换函数
-        if input_file.lower().endswith(".vtt"):
-            txt = vtt2txt(content)
-        elif input_file.lower().endswith(".lrc"):
-            txt = lrc2txt(content)
-        else:
-            raise ValueError(f"不支持的文件格式: {input_file}")
+        # 先尝试 UTF-8，失败时用 chardet 检测编码，检测结果记录在 cache_path 中
+        start = time.time()
+        content = decode_bytes(raw_data, cache_path)
+        del raw_data
+        record_stage(stats, "decode", start)
 
-        with open(output_file, 'w', encoding='utf-8') as f_out:
+        start = time.time()
+
+        # 根据文件扩展名选择转换函数；只有字幕解析函数的格式（如 .srt）逐条取出字幕文本
+        # dedup 时也逐条取出字幕，去重需要字幕的时间（LRC 按时间标签解析）
+        convert = None if dedup else find_handler("txt", input_file)
+        if convert is not None:
+            txt = convert(content, clean)
+        else:
+            if format_extension(input_file) == ".lrc":
+                parse = lrc_cues
+            else:
+                parse = find_handler("cues", input_file)
+            if parse is None:
+                raise ValueError(f"不支持的文件格式: {input_file}")
+            out = io.StringIO()
+            write_txt(cue_pipeline(content.split("\n"), clean, parse=parse, dedup=dedup), out)
+            txt = out.getvalue()
+
+        # 指定 compression 时输出边写边压缩，文件名加上对应后缀
+        f_out, output_file = open_output(output_file, compression)
+        with f_out:
             f_out.write(txt)
+        record_stage(stats, "convert", start)
         return True
     except Exception as e:
+        stats["error"] = type(e).__name__
         print(f"转换失败: {e}")
         return False
 
@@ -112,29 +150,212 @@ def extract_number_from_filename(filename):
     return float('inf')
 
 
-def merge_txt_files(txt_files, output_file):
-    """合并多个TXT文件到一个文件中"""
+# 判断首尾空白时每次读取的字节数
+EDGE_SIZE = 4096
+# 无法在内核中复制时使用的缓冲区大小
+COPY_BUFSIZE = 1024 * 1024
+# 检查内容能否按字节原样复制时每次读取的字节数
+SCAN_SIZE = 64 * 1024
+# 文件之间的分隔，与文本模式写入 "\n\n" 的结果一致
+SEPARATOR = (os.linesep * 2).encode('utf-8')
+
+
+def find_content_range(infile, size):
+    """只读取文件首尾，返回去掉首尾空白后内容所在的字节范围 (start, end)"""
+    # 去掉开头的空白
+    start = 0
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pos = 0
+    while pos < size:
+        infile.seek(pos)
+        data = infile.read(EDGE_SIZE)
+        if not data:
+            break
+        pos += len(data)
+        text = decoder.decode(data, final=(pos >= size))
+        stripped = text.lstrip()
+        start += len(text[:len(text) - len(stripped)].encode('utf-8'))
+        if stripped:
+            break
+    else:
+        return size, size
+
+    # 去掉结尾的空白
+    end = size
+    while end > start:
+        # 窗口至少能容纳一个完整的 UTF-8 字符
+        window_start = max(start, end - max(EDGE_SIZE, 4))
+        infile.seek(window_start)
+        data = infile.read(end - window_start)
+        # 跳过被窗口切开的多字节字符的后续字节
+        skip = 0
+        while window_start > start and skip < 3 and 0x80 <= data[skip] < 0xC0:
+            skip += 1
+        text = data[skip:].decode('utf-8')
+        if not text:
+            raise ValueError("文件不是有效的 UTF-8 编码。")
+        stripped = text.rstrip()
+        end -= len(text[len(stripped):].encode('utf-8'))
+        if stripped:
+            break
+        end = window_start + skip
+
+    return start, end
+
+
+def copy_range(infile, outfile, offset, count, kernel=True):
+    """把 infile 中 [offset, offset + count) 追加到 outfile，kernel 为 True 时尽量在内核中完成复制"""
+    in_fd = infile.fileno()
+    out_fd = outfile.fileno()
+
+    if kernel and hasattr(os, 'copy_file_range'):
+        try:
+            while count > 0:
+                copied = os.copy_file_range(in_fd, out_fd, count, offset)
+                if copied == 0:
+                    return
+                offset += copied
+                count -= copied
+            return
+        except OSError:
+            # 跨文件系统等情况下不支持，继续用下面的方式复制剩余部分
+            pass
+
+    if kernel and hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            while count > 0:
+                copied = os.sendfile(out_fd, in_fd, offset, count)
+                if copied == 0:
+                    return
+                offset += copied
+                count -= copied
+            return
+        except OSError:
+            pass
+
+    # 使用固定大小的缓冲区复制
+    buffer = bytearray(min(COPY_BUFSIZE, count))
+    view = memoryview(buffer)
+    infile.seek(offset)
+    while count > 0:
+        read = infile.readinto(view[:min(len(buffer), count)])
+        if not read:
+            return
+        outfile.write(view[:read])
+        count -= read
+
+
+def is_plain_range(infile, offset, count):
+    """[offset, offset + count) 中没有 \\r 时返回 True，可以按字节原样复制
+
+    同时检查是否是有效的 UTF-8，无效时与文本模式读取一样抛出 UnicodeDecodeError。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    infile.seek(offset)
+    plain = True
+    while count > 0:
+        data = infile.read(min(SCAN_SIZE, count))
+        if not data:
+            break
+        count -= len(data)
+        decoder.decode(data, final=count <= 0)
+        if b"\r" in data:
+            plain = False
+    return plain
+
+
+def copy_stripped(infile, outfile):
+    """边读边去掉首尾空白后写入 outfile，返回是否写入了内容
+
+    与文本模式读写的结果一致：\\r\\n 和单独的 \\r 转为换行，换行按 os.linesep 写出，
+    不是有效的 UTF-8 时抛出 UnicodeDecodeError。用于压缩文件和不能按字节原样复制的文件。
+    """
+    reader = io.TextIOWrapper(infile, encoding='utf-8', newline=None)
+    started = False
+    pending = ""  # 暂不写出的结尾空白，后面还有内容时再写
+    try:
+        while True:
+            text = reader.read(COPY_BUFSIZE)
+            if not text:
+                return started
+            if not started:
+                text = text.lstrip()
+                started = bool(text)
+            if text:
+                stripped = text.rstrip()
+                if stripped:
+                    outfile.write((pending + stripped).replace("\n", os.linesep).encode('utf-8'))
+                    pending = text[len(stripped):]
+                else:
+                    pending += text
+    finally:
+        reader.detach()
+
+
+def merge_txt_files(txt_files, output_file, compression=None, stats=None):
+    """合并多个TXT文件到一个文件中，内存占用与文件大小无关
+
+    输入可以是 .txt.gz 等压缩文件；指定 compression 时输出边写边压缩，文件名加上对应后缀。
+    传入 stats 时，合并的耗时和起止时间记录为 merge 阶段。
+    """
+    if stats is None:
+        stats = {}
+    merge_start = time.time()
     try:
         # 按文件名中的数字排序
         sorted_files = sorted(
             txt_files,
-            key=lambda f: extract_number_from_filename(os.path.basename(f))
+            key=lambda f: extract_number_from_filename(os.path.basename(split_compression(f)[0]))
         )
 
-        with open(output_file, 'w', encoding='utf-8') as outfile:
+        suffix = compression_suffix(compression)
+        if suffix:
+            outfile = open_output(output_file, compression)[0].detach()
+        else:
+            # 不带缓冲直接写文件描述符，与内核复制共用同一个文件位置
+            outfile = open(output_file, 'wb', buffering=0)
+
+        with outfile:
             for txt_file in sorted_files:
-                # 写入文件内容（不添加任何标题）
-                with open(txt_file, 'r', encoding='utf-8') as infile:
-                    content = infile.read().strip()  # 移除首尾空白
-                    if content:  # 确保内容不为空
-                        outfile.write(content)
-                        outfile.write("\n\n")  # 文件之间添加两个换行符分隔
+                # 写入文件内容（不添加任何标题），移除首尾空白
+                if split_compression(txt_file)[1]:
+                    with open_input(txt_file) as infile:
+                        written = copy_stripped(infile, outfile)
+                else:
+                    with open(txt_file, 'rb') as infile:
+                        size = os.fstat(infile.fileno()).st_size
+                        start, end = find_content_range(infile, size)
+                        written = end > start  # 确保内容不为空
+                        # 内容中有 \r（需要转换换行）或换行不是 \n 的系统上，不能按字节原样复制
+                        if written and os.linesep == "\n" and is_plain_range(infile, start, end - start):
+                            copy_range(infile, outfile, start, end - start, kernel=not suffix)
+                        elif written:
+                            infile.seek(0)
+                            written = copy_stripped(infile, outfile)
+                if written:
+                    outfile.write(SEPARATOR)  # 文件之间添加两个换行符分隔
+        record_stage(stats, "merge", merge_start)
         return True
     except Exception as e:
+        stats["error"] = type(e).__name__
         print(f"合并文件失败: {e}")
         return False
 
 
+def traced(profiler, path, func, *args):
+    """调用 func(*args, stats=...)，profiler 不为 None 时把这一步（以 path 命名）及其各阶段写入时间线"""
+    stats = {"pid": os.getpid(), "tid": threading.get_ident(), "start": time.time()}
+    try:
+        ok = func(*args, stats=stats)
+    finally:
+        stats["end"] = time.time()
+    if profiler is not None:
+        from vtt2lrc_batch import Job
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        profiler.job_done(Job(path, None, size), ok, stats)
+    return ok
+
+
 def get_last_folder_name(path):
     """获取路径中最后一个文件夹的名称"""
     # 规范化路径并移除末尾斜杠
@@ -158,49 +379,65 @@ if __name__ == "__main__":
     # 在""内填入地址
     folder_path = r""
 
+    # 设为 True 时去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体
+    clean = False
+    # 设为 True 时全角英数字和符号转为半角
+    fold_width = False
+    cleaner = make_cleaner(clean, fold_width)
+    # 设为 True 时合并自动生成字幕（滚动字幕）中重复的字幕
+    dedup = False
+    # 编码检测缓存，设为 None 时不使用
+    encoding_cache = DEFAULT_CACHE_PATH
+    # 输出压缩格式：None、"gz"、"xz"、"bz2"
+    compression = None
+    # 设为文件路径时，把每个文件的读取、编码检测、转换和最后的合并写成 Chrome trace event 格式的时间线
+    trace_path = None
+
     if not os.path.isdir(folder_path):
         print(f"路径 '{folder_path}' 无效或不是文件夹。")
         sys.exit(1)
 
-    # 递归查找所有.vtt和.lrc文件，并确保每个基名只处理一次
+    # 递归查找所有.vtt、.lrc 等支持的文件，并确保每个基名只处理一次
     processed_basenames = set()
     converted_files = []
     generated_txt_files = []  # 存储所有生成的TXT文件路径
 
-    # 先处理所有VTT文件
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".vtt"):
-                file_path = os.path.join(root, file)
-                basename = os.path.splitext(file)[0]  # 不带扩展名的文件名
-
-                # 如果这个基名还没有处理过
-                if basename not in processed_basenames:
-                    processed_basenames.add(basename)
-                    converted_files.append(file_path)
-
-    # 再处理LRC文件，但跳过已有同名VTT文件的
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".lrc"):
-                file_path = os.path.join(root, file)
-                basename = os.path.splitext(file)[0]  # 不带扩展名的文件名
-
-                # 如果这个基名还没有处理过
-                if basename not in processed_basenames:
-                    processed_basenames.add(basename)
-                    converted_files.append(file_path)
+    # 多线程并行列目录，一次遍历同时找出所有支持的文件，顺序与 os.walk 相同
+    # 要等遍历结束再转换：同名文件按格式顺序在整个目录树中只选一个，后面才找到的 .vtt 也会让同名的 .lrc 跳过，
+    # 同一格式的同名文件取 os.walk 顺序中的第一个，边找边转换会选中不同的文件
+    supported = extensions("txt", "cues")
+    found_files = walk_files(folder_path, lambda name: format_extension(name) in supported)
+
+    # 先处理所有VTT文件，再处理LRC文件和其他格式（如 SRT），跳过已有同名文件的
+    for extension in supported:
+        for file_path in found_files:
+            if format_extension(file_path) != extension:
+                continue
+            name = split_compression(os.path.basename(file_path))[0]  # 去除 .gz 等压缩后缀
+            basename = os.path.splitext(name)[0]  # 不带扩展名的文件名
+
+            # 如果这个基名还没有处理过
+            if basename not in processed_basenames:
+                processed_basenames.add(basename)
+                converted_files.append(file_path)
 
     if not converted_files:
-        print("该文件夹及子文件夹中没有找到支持的 .vtt 或 .lrc 文件。")
+        print(f"该文件夹及子文件夹中没有找到支持的 {' 或 '.join(supported)} 文件。")
         sys.exit(0)
 
+    profiler = None
+    if trace_path:
+        from vtt2lrc_profile import BatchProfiler
+        profiler = BatchProfiler(trace_path=trace_path)
+
     # 转换文件并记录生成的TXT文件
     for input_file in converted_files:
         # 生成输出文件名：替换扩展名为.txt
-        output_file = os.path.splitext(input_file)[0] + ".txt"
+        output_file = os.path.splitext(split_compression(input_file)[0])[0] + ".txt"
 
-        if convert_to_txt(input_file, output_file):
+        if traced(profiler, input_file, convert_to_txt,
+                  input_file, output_file, cleaner, encoding_cache, compression, dedup):
+            output_file += compression_suffix(compression)
             print(f"成功转换: {input_file} -> {output_file}")
             generated_txt_files.append(output_file)
         else:
@@ -214,11 +451,16 @@ if __name__ == "__main__":
         # 创建合并文件名
         combined_file = os.path.join(folder_path, f"{folder_name}.txt")
 
-        if merge_txt_files(generated_txt_files, combined_file):
+        if traced(profiler, combined_file, merge_txt_files, generated_txt_files, combined_file, compression):
+            combined_file += compression_suffix(compression)
             print(f"成功合并 {len(generated_txt_files)} 个TXT文件到: {combined_file}")
         else:
             print("合并TXT文件失败")
     else:
         print("没有生成TXT文件，无法合并")
 
+    if profiler is not None:
+        profiler.close()
+        print(f"时间线已写入: {trace_path}")
+
     print("所有操作完成")
\ No newline at end of file
@@ -0,0 +1,148 @@
+import sys
+import os
+import io
+import gzip
+import random
+import shutil
+import tempfile
+import contextlib
+
+from vl2txt_mergeOutput import merge_txt_files, extract_number_from_filename
+
+
+# -*- coding: utf-8 -*-
+
+# 随机生成文件内容的片段：多字节字符、各种换行和空白、BOM、无效的 UTF-8
+PIECES = [
+    "这是测试文件", "hello world", "ねえ、聞こえる？", "é", "😀",
+    "\n", "\r\n", "\r", " ", "\t", "　", "\x85", "\x0b",
+]
+RARE_PIECES = [b"\xef\xbb\xbf", b"\xff", b"\xe4\xb8"]
+
+
+def merge_txt_files_reference(txt_files, output_file):
+    """改为按字节复制之前的实现（整个文件以文本模式读入），作为比较的基准"""
+    try:
+        # 按文件名中的数字排序
+        sorted_files = sorted(
+            txt_files,
+            key=lambda f: extract_number_from_filename(os.path.basename(f))
+        )
+
+        with open(output_file, 'w', encoding='utf-8') as outfile:
+            for txt_file in sorted_files:
+                # 写入文件内容（不添加任何标题）
+                with open(txt_file, 'r', encoding='utf-8') as infile:
+                    content = infile.read().strip()  # 移除首尾空白
+                    if content:  # 确保内容不为空
+                        outfile.write(content)
+                        outfile.write("\n\n")  # 文件之间添加两个换行符分隔
+        return True
+    except Exception as e:
+        print(f"合并文件失败: {e}")
+        return False
+
+
+def random_content(rng):
+    """随机的文件内容（字节），有时是空文件、只有空白或超过一次读取窗口的长空白"""
+    kind = rng.random()
+    if kind < 0.05:
+        return b""
+    parts = []
+    if kind < 0.2:
+        # 首尾的长空白跨过 find_content_range 的读取窗口
+        parts.append(rng.choice([" ", "\n", "\r\n", "　"]) * rng.randint(1000, 5000))
+    for _ in range(rng.randint(0, 30)):
+        parts.append(rng.choice(PIECES))
+    if kind < 0.2:
+        parts.append(rng.choice([" ", "\n", "\r", "　"]) * rng.randint(1000, 5000))
+    data = "".join(parts).encode('utf-8')
+    if rng.random() < 0.1:
+        rare = rng.choice(RARE_PIECES)
+        pos = 0 if rare.startswith(b"\xef") else rng.randint(0, len(data))
+        data = data[:pos] + rare + data[pos:]
+    return data
+
+
+def run_case(rng, workdir):
+    """生成一组文件分别合并，返回 (是否一致, 说明)"""
+    plain_dir = os.path.join(workdir, "plain")
+    fast_dir = os.path.join(workdir, "fast")
+    os.makedirs(plain_dir)
+    os.makedirs(fast_dir)
+
+    plain_files = []
+    fast_files = []
+    contents = {}
+    for i in range(rng.randint(1, 4)):
+        name = f"{i + 1:02d}.txt"
+        data = random_content(rng)
+        contents[name] = data
+        plain_path = os.path.join(plain_dir, name)
+        with open(plain_path, 'wb') as f:
+            f.write(data)
+        plain_files.append(plain_path)
+        # 有时用压缩文件作为输入，基准读取对应的未压缩文件
+        if rng.random() < 0.3:
+            fast_path = os.path.join(fast_dir, name + ".gz")
+            with gzip.open(fast_path, 'wb') as f:
+                f.write(data)
+        else:
+            fast_path = os.path.join(fast_dir, name)
+            with open(fast_path, 'wb') as f:
+                f.write(data)
+        fast_files.append(fast_path)
+
+    expected_path = os.path.join(workdir, "expected.txt")
+    actual_path = os.path.join(workdir, "actual.txt")
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected_ok = merge_txt_files_reference(plain_files, expected_path)
+        actual_ok = merge_txt_files(fast_files, actual_path)
+
+    if expected_ok != actual_ok:
+        return False, f"基准{'成功' if expected_ok else '失败'}，当前实现{'成功' if actual_ok else '失败'}", contents
+    if not expected_ok:
+        return True, None, contents
+    with open(expected_path, 'rb') as f:
+        expected = f.read()
+    with open(actual_path, 'rb') as f:
+        actual = f.read()
+    if expected != actual:
+        return False, f"输出不一致:\n基准: {expected[:200]!r}\n当前: {actual[:200]!r}", contents
+    return True, None, contents
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("Usage: python vl2txt_mergecheck.py [cases] [seed]")
+        sys.exit(0)
+
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+
+    tmpdir = tempfile.mkdtemp(prefix="vl2txt_mergecheck_")
+    same = diff = 0
+    example = None
+    try:
+        for case in range(cases):
+            workdir = os.path.join(tmpdir, str(case))
+            ok, detail, contents = run_case(rng, workdir)
+            shutil.rmtree(workdir, ignore_errors=True)
+            if ok:
+                same += 1
+                continue
+            diff += 1
+            if example is None:
+                example = (contents, detail)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"随机用例: {cases}，种子: {seed}，与文本模式的实现一致: {same}，不一致: {diff}")
+    if example is not None:
+        contents, detail = example
+        print("-" * 50)
+        for name, data in contents.items():
+            print(f"{name}: {data[:200]!r}{'...' if len(data) > 200 else ''}")
+        print(detail)
+        sys.exit(1)
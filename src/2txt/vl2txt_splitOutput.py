@@ -2,16 +2,22 @@ import sys
 import os
 import glob
 import shutil
-import chardet
 import re
 from datetime import datetime, timedelta
 import io
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "2lrc"))
+from vtt2lrc_stream import make_cleaner, decode_bytes, cue_pipeline, write_txt, lrc_cues
+from vtt2lrc_formats import register_handler, find_handler, format_extension, extensions
+from vtt2lrc_cache import DEFAULT_CACHE_PATH
+from vtt2lrc_walk import walk_files
+from vtt2lrc_compress import split_compression, open_input, open_output, compression_suffix
+
 
 # -*- coding: utf-8 -*-
 
-def vtt2txt(vtt_content):
-    """将VTT内容转换为纯文本"""
+def vtt2txt(vtt_content, clean=None):
+    """将VTT内容转换为纯文本，clean 为逐条处理字幕文本的函数"""
     txt = io.StringIO()
 
     lines = vtt_content.split("\n")
@@ -43,12 +49,16 @@ def vtt2txt(vtt_content):
         # 如果块中有文本内容，则添加到输出
         if text_lines:
             # 将多行文本合并为一行（用空格分隔）
-            txt.write(' '.join(text_lines) + "\n")
+            text = ' '.join(text_lines)
+            if clean is not None:
+                text = clean(text)
+            if text:
+                txt.write(text + "\n")
 
     return txt.getvalue()
 
 
-def lrc2txt(lrc_content):
+def lrc2txt(lrc_content, clean=None):
     """将LRC内容转换为纯文本"""
     txt = io.StringIO()
 
@@ -56,6 +66,8 @@ def lrc2txt(lrc_content):
     for line in lines:
         # 使用正则表达式移除所有方括号及其内容
         clean_line = re.sub(r'\[.*?\]', '', line).strip()
+        if clean is not None:
+            clean_line = clean(clean_line)
 
         # 如果处理后还有内容，则写入输出
         if clean_line:
@@ -64,31 +76,38 @@ def lrc2txt(lrc_content):
     return txt.getvalue()
 
 
-def convert_to_txt(input_file, output_file):
+# 内置的纯文本转换函数，其他格式在 vtt2lrc_formats 中查找
+register_handler("txt", ".vtt", vtt2txt)
+register_handler("txt", ".lrc", lrc2txt)
+
+
+def convert_to_txt(input_file, output_file, clean=None, cache_path=None, compression=None, dedup=False):
+    """dedup 为 True 时按字幕的时间合并自动生成字幕（滚动字幕）中重复的行"""
     try:
-        with open(input_file, 'rb') as f:
-            raw_data = f.read()
-
-            # 尝试使用 UTF-8 解码
-            try:
-                content = raw_data.decode('utf-8')
-            except UnicodeDecodeError:
-                # 使用 chardet 检测编码
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-                if encoding is None:
-                    raise ValueError("无法检测文件编码。")
-                content = raw_data.decode(encoding)
-
-        # 根据文件扩展名选择转换函数
-        if input_file.lower().endswith(".vtt"):
-            txt = vtt2txt(content)
-        elif input_file.lower().endswith(".lrc"):
-            txt = lrc2txt(content)
+        # 输入可以是 .vtt.gz 等压缩文件
+        with open_input(input_file) as f:
+            # 先尝试 UTF-8，失败时用 chardet 检测编码，检测结果记录在 cache_path 中
+            content = decode_bytes(f.read(), cache_path)
+
+        # 根据文件扩展名选择转换函数；只有字幕解析函数的格式（如 .srt）逐条取出字幕文本
+        # dedup 时也逐条取出字幕，去重需要字幕的时间（LRC 按时间标签解析）
+        convert = None if dedup else find_handler("txt", input_file)
+        if convert is not None:
+            txt = convert(content, clean)
         else:
-            raise ValueError(f"不支持的文件格式: {input_file}")
-
-        with open(output_file, 'w', encoding='utf-8') as f_out:
+            if format_extension(input_file) == ".lrc":
+                parse = lrc_cues
+            else:
+                parse = find_handler("cues", input_file)
+            if parse is None:
+                raise ValueError(f"不支持的文件格式: {input_file}")
+            out = io.StringIO()
+            write_txt(cue_pipeline(content.split("\n"), clean, parse=parse, dedup=dedup), out)
+            txt = out.getvalue()
+
+        # 指定 compression 时输出边写边压缩，文件名加上对应后缀
+        f_out, output_file = open_output(output_file, compression)
+        with f_out:
             f_out.write(txt)
         return True
     except Exception as e:
@@ -100,47 +119,55 @@ if __name__ == "__main__":
     # 在""内填入地址
     folder_path = r"F:\vioce\shadow\RJ341000 和狐娘巫女友好交流"
 
+    # 设为 True 时去除 <v>、<c>、<i> 等标签和行内时间戳，解码 &amp; 等实体
+    clean = False
+    # 设为 True 时全角英数字和符号转为半角
+    fold_width = False
+    cleaner = make_cleaner(clean, fold_width)
+    # 设为 True 时合并自动生成字幕（滚动字幕）中重复的字幕
+    dedup = False
+    # 编码检测缓存，设为 None 时不使用
+    encoding_cache = DEFAULT_CACHE_PATH
+    # 输出压缩格式：None、"gz"、"xz"、"bz2"
+    compression = None
+
     if not os.path.isdir(folder_path):
         print(f"路径 '{folder_path}' 无效或不是文件夹。")
         sys.exit(1)
 
-    # 递归查找所有.vtt和.lrc文件，并确保每个基名只处理一次
+    # 递归查找所有.vtt、.lrc 等支持的文件，并确保每个基名只处理一次
     processed_basenames = set()
     converted_files = []
 
-    # 先处理所有VTT文件
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".vtt"):
-                file_path = os.path.join(root, file)
-                basename = os.path.splitext(file)[0]  # 不带扩展名的文件名
-
-                # 如果这个基名还没有处理过
-                if basename not in processed_basenames:
-                    processed_basenames.add(basename)
-                    converted_files.append(file_path)
-
-    # 再处理LRC文件，但跳过已有同名VTT文件的
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith(".lrc"):
-                file_path = os.path.join(root, file)
-                basename = os.path.splitext(file)[0]  # 不带扩展名的文件名
-
-                # 如果这个基名还没有处理过
-                if basename not in processed_basenames:
-                    processed_basenames.add(basename)
-                    converted_files.append(file_path)
+    # 多线程并行列目录，一次遍历同时找出所有支持的文件，顺序与 os.walk 相同
+    # 要等遍历结束再转换：同名文件按格式顺序在整个目录树中只选一个，后面才找到的 .vtt 也会让同名的 .lrc 跳过，
+    # 同一格式的同名文件取 os.walk 顺序中的第一个，边找边转换会选中不同的文件
+    supported = extensions("txt", "cues")
+    found_files = walk_files(folder_path, lambda name: format_extension(name) in supported)
+
+    # 先处理所有VTT文件，再处理LRC文件和其他格式（如 SRT），跳过已有同名文件的
+    for extension in supported:
+        for file_path in found_files:
+            if format_extension(file_path) != extension:
+                continue
+            name = split_compression(os.path.basename(file_path))[0]  # 去除 .gz 等压缩后缀
+            basename = os.path.splitext(name)[0]  # 不带扩展名的文件名
+
+            # 如果这个基名还没有处理过
+            if basename not in processed_basenames:
+                processed_basenames.add(basename)
+                converted_files.append(file_path)
 
     if not converted_files:
-        print("该文件夹及子文件夹中没有找到支持的 .vtt 或 .lrc 文件。")
+        print(f"该文件夹及子文件夹中没有找到支持的 {' 或 '.join(supported)} 文件。")
         sys.exit(0)
 
     for input_file in converted_files:
         # 生成输出文件名：替换扩展名为.txt
-        output_file = os.path.splitext(input_file)[0] + ".txt"
+        output_file = os.path.splitext(split_compression(input_file)[0])[0] + ".txt"
 
-        if convert_to_txt(input_file, output_file):
+        if convert_to_txt(input_file, output_file, cleaner, encoding_cache, compression, dedup):
+            output_file += compression_suffix(compression)
             print(f"成功转换: {input_file} -> {output_file}")
         else:
             print(f"转换失败: {input_file}")